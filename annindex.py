@@ -0,0 +1,124 @@
+# Approximate nearest neighbour index for exWordNet vectors
+#
+# inverted file (IVF) index: the unit length rows of a compiled vector store
+# are clustered with spherical k-means, and a query only scores the rows of
+# the nprobe clusters whose centroids are closest to it
+# the index is saved as <name>.ivf.npz next to the vector file
+import os
+
+import numpy as np
+
+from vectorstore import compiled_paths
+
+class ANNIndexError(Exception):
+    """An exception class for ann index errors."""
+
+def index_path(file_name):
+    """
+    return the path of the ann index built from the vector file
+    """
+    base = os.path.splitext(file_name)[0]
+    return '%s.ivf.npz' % base
+
+def is_indexed(file_name):
+    """
+    check whether an ann index newer than the compiled store exists
+    """
+    path = index_path(file_name)
+    matrix_file = compiled_paths(file_name)[1]
+    if not os.path.exists(path):
+        return False
+    if os.path.exists(matrix_file):
+        return os.path.getmtime(path) >= os.path.getmtime(matrix_file)
+    return True
+
+def _assign(matrix, centroids, chunk_size=65536):
+    """
+    index of the closest centroid for every row, computed chunk by chunk
+    """
+    assign = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), chunk_size):
+        scores = np.dot(matrix[start:start+chunk_size], centroids.T)
+        assign[start:start+chunk_size] = np.argmax(scores, axis=1)
+    return assign
+
+class IVFIndex(object):
+    """
+    inverted file index over unit length rows
+    rows[offsets[c]:offsets[c+1]] are the row numbers belonging to cluster c
+    """
+    def __init__(self, centroids, offsets, rows):
+        self._centroids = centroids
+        self._offsets = offsets
+        self._rows = rows
+
+    @classmethod
+    def build(cls, matrix, nlist=None, n_iter=10, sample_size=100000, seed=0):
+        """
+        cluster the unit length rows of matrix into nlist lists
+        centroids are trained on a random sample, then every row is assigned
+        """
+        n = len(matrix)
+        if n == 0:
+            raise ANNIndexError('cannot build an index over an empty matrix')
+        if nlist is None:
+            nlist = int(np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+
+        rng = np.random.RandomState(seed)
+        sample = matrix
+        if n > sample_size:
+            sample = matrix[np.sort(rng.choice(n, sample_size, replace=False))]
+        sample = np.asarray(sample, dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.sqrt(np.einsum('ij,ij->i', sums, sums))
+            # empty clusters keep their previous centroid
+            filled = norms > 0
+            centroids[filled] = sums[filled]/norms[filled, np.newaxis]
+
+        assign = _assign(matrix, centroids)
+        rows = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=nlist)
+        offsets = np.zeros(nlist+1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(centroids, offsets, rows)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'], data['rows'])
+
+    def save(self, path):
+        np.savez(path, centroids=self._centroids, offsets=self._offsets, rows=self._rows)
+
+    def nlist(self):
+        return len(self._centroids)
+
+    def candidates(self, query, nprobe=8):
+        """
+        row numbers in the nprobe lists closest to the unit length query
+        """
+        nprobe = max(1, min(nprobe, self.nlist()))
+        scores = np.dot(self._centroids, query)
+        probe = np.argpartition(-scores, nprobe-1)[:nprobe]
+        return np.concatenate([self._rows[self._offsets[c]:self._offsets[c+1]] for c in probe])
+
+    def search(self, matrix, query, k=10, nprobe=8):
+        """
+        approximate top k rows of matrix for the unit length query
+        returns row numbers and scores in descending order
+        more probed lists give higher recall at the cost of latency
+        """
+        rows = self.candidates(query, nprobe)
+        scores = np.dot(matrix[rows], query)
+        k = min(k, len(rows))
+        if k <= 0:
+            return rows[:0], scores[:0]
+        top = np.argpartition(-scores, k-1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
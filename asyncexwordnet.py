@@ -0,0 +1,128 @@
+# asyncio facade of exWordNet for serving similarity queries
+#
+# every call runs on a bounded thread pool instead of the event loop,
+# identical requests made while one is in flight share its result,
+# and new computations are refused once max_pending are in flight
+#
+#   async with AsyncExWordNet('path/to/data', max_workers=4) as awn:
+#       score = await awn.relatedness(synset, lemma)
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from exWordNet import exWordNet, exWordNetError
+
+class OverloadedError(exWordNetError):
+    """Raised when too many computations are already pending."""
+
+class AsyncExWordNet(object):
+    """
+    async version of the exWordNet query methods
+      vector(obj)
+      relatedness(obj_in, obj_out)
+      association(word, other, topic, index)
+      topic_relatedness(word, topic)
+      definition(synset, lang)
+    max_workers computations run at the same time, at most max_pending
+    (running or waiting) are accepted, then OverloadedError is raised
+    an instance is meant to be used from one event loop
+    """
+    def __init__(self, exwordnet, max_workers=4, max_pending=1000):
+        # a root is opened here and closed with this instance
+        self._owned = not isinstance(exwordnet, exWordNet)
+        if self._owned:
+            exwordnet = exWordNet(exwordnet)
+        if max_workers < 1 or max_pending < 1:
+            raise exWordNetError('max_workers and max_pending must be positive')
+        self._exwordnet = exwordnet
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._max_pending = max_pending
+        # request key -> future of the computation in flight
+        self._inflight = {}
+
+    @property
+    def exwordnet(self):
+        return self._exwordnet
+
+    def pending(self):
+        """
+        number of computations running or waiting for a worker
+        """
+        return len(self._inflight)
+
+    async def _submit(self, key, function, *args):
+        """
+        run function(*args) on the executor, or join the identical request in flight
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            if len(self._inflight) >= self._max_pending:
+                raise OverloadedError('%d computations are already pending' % len(self._inflight))
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, function, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        # a cancelled caller must not cancel the computation of the others
+        return await asyncio.shield(future)
+
+    def _done(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def _object_key(self, obj):
+        """
+        request key of a WordNet object
+        nltk compares lemmas by their name only, so lemmas of different synsets
+        or languages would share the computation of the first one
+        """
+        kind = type(obj).__name__.lower()
+        if kind == 'synset':
+            return kind, obj._name
+        elif kind == 'lemma':
+            return kind, obj._synset._name, obj._name, obj._lang
+        elif kind == 'word':
+            return kind, obj._name, obj._pos, obj._lang
+        return kind, obj
+
+    async def vector(self, obj):
+        # the vector only depends on the file and the key it is looked up with
+        key = self._exwordnet._vector_key(obj)
+        return await self._submit(('vector', key), self._exwordnet.vector, obj)
+
+    async def relatedness(self, obj_in, obj_out):
+        key = self._exwordnet._vector_key(obj_in), self._exwordnet._vector_key(obj_out)
+        return await self._submit(('relatedness', key), self._exwordnet.relatedness, obj_in, obj_out)
+
+    async def association(self, word, other, topic=None, index=False):
+        key = self._object_key(word), self._object_key(other), topic, index
+        return await self._submit(('association', key), word.association, other, topic, index)
+
+    async def topic_relatedness(self, word, topic):
+        key = self._object_key(word), topic
+        return await self._submit(('topic_relatedness', key), word.topic_relatedness, topic)
+
+    async def definition(self, synset, lang='eng'):
+        key = self._object_key(synset), lang
+        return await self._submit(('definition', key), self._exwordnet.definition, synset, lang)
+
+    def close(self):
+        """
+        wait for the running computations and release the workers
+        the exWordNet is closed as well if it was opened from a root
+        this blocks, from a coroutine use aclose()
+        """
+        self._executor.shutdown(wait=True)
+        if self._owned:
+            self._exwordnet.close()
+
+    async def aclose(self):
+        """
+        close() on another thread, so that the event loop keeps running
+        while the computations finish
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
@@ -0,0 +1,61 @@
+# Recall and latency of the IVF index against exact search
+#
+# python benchmarks/ann_benchmark.py [--rows N] [--dim D] [--k K] ...
+# vectors are synthetic (a mixture of gaussians, like clustered embeddings),
+# so results are comparable between runs but not with real data
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from annindex import IVFIndex
+
+def synthetic_matrix(rows, dim, clusters, seed=0):
+    rng = np.random.RandomState(seed)
+    centers = rng.normal(size=(clusters, dim))
+    matrix = centers[rng.randint(clusters, size=rows)] + 1.5*rng.normal(size=(rows, dim))
+    matrix /= np.sqrt(np.einsum('ij,ij->i', matrix, matrix))[:, np.newaxis]
+    return matrix.astype(np.float32)
+
+def exact_search(matrix, query, k):
+    scores = np.dot(matrix, query)
+    top = np.argpartition(-scores, k-1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def main():
+    parser = argparse.ArgumentParser(description='compare IVF search with exact search')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=300)
+    parser.add_argument('--clusters', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    matrix = synthetic_matrix(args.rows, args.dim, args.clusters)
+    rng = np.random.RandomState(1)
+    queries = matrix[rng.choice(args.rows, args.queries, replace=False)]
+
+    start = time.time()
+    index = IVFIndex.build(matrix, nlist=args.nlist)
+    print('rows: %d, dim: %d, nlist: %d, build: %.2fs' % (args.rows, args.dim, index.nlist(), time.time() - start))
+
+    start = time.time()
+    truth = [exact_search(matrix, q, args.k) for q in queries]
+    exact_ms = 1000*(time.time() - start)/len(queries)
+    print('%-8s %10s %12s %10s' % ('nprobe', 'recall@%d' % args.k, 'latency(ms)', 'speedup'))
+    print('%-8s %10.3f %12.3f %10.1f' % ('exact', 1.0, exact_ms, 1.0))
+
+    for nprobe in args.nprobe:
+        start = time.time()
+        results = [index.search(matrix, q, args.k, nprobe)[0] for q in queries]
+        ann_ms = 1000*(time.time() - start)/len(queries)
+        recall = np.mean([len(np.intersect1d(r, t))/args.k for r, t in zip(results, truth)])
+        print('%-8d %10.3f %12.3f %10.1f' % (nprobe, recall, ann_ms, exact_ms/ann_ms))
+
+if __name__ == '__main__':
+    main()
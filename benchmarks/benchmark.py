@@ -0,0 +1,339 @@
+# Latency, throughput and memory of the exWordNet hot paths
+#
+# python benchmarks/benchmark.py [--root DIR] [--synsets N] [--dim D] [--calls N]
+#                                [--compiled] [--extractors]
+#                                [--save FILE] [--baseline FILE] [--tolerance T]
+# a synthetic data root is generated in --root unless it already exists:
+# random vectors for a sample of the synsets of the installed WordNet, with
+# their lemmas and words, freq files for every topic, topics.txt and
+# definition files, in the layouts described in README.md
+# every operation is timed per call on one exWordNet instance after a warm up,
+# peak memory is measured in a second pass with tracemalloc on a new instance
+# (loading included) so that tracing does not slow down the timed pass
+# the exit status is 1 if any call raised, e.g. a key missing from the root
+# with --baseline, the p50 latency and the peak memory are compared with a
+# saved result and the exit status is 1 if any of them regressed
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from exWordNet import exWordNet, exWordNetError
+from vectorstore import compile_root, is_compiled
+
+###############################
+# synthetic data root
+###############################
+def _write_vectors(file_name, keys, dim, rng):
+    # sorted, the text files are binary searched when they are not compiled
+    with io.open(file_name, 'w', encoding='utf-8') as f:
+        for key in sorted(keys):
+            f.write('%s %s\n' % (key, ' '.join('%.6f' % v for v in rng.normal(size=dim))))
+
+def _definition_key(synset):
+    return '{:08d}-{}'.format(synset.offset(), synset.pos())
+
+def make_root(root, langs=('eng',), n_synsets=5000, dim=50, seed=0):
+    """
+    write a synthetic data root for a random sample of n_synsets synsets
+      synsets.txt                  synset vectors
+      topics.txt                   topic vectors
+      <lang>/lemmas.txt            lemma vectors, keyed '<synset>:<lemma>'
+      <lang>/words.txt             word vectors, keyed by the lemma name
+      <lang>/freq/freq.<topic>.txt total, then '<synset>:<lemma> <count>'
+      <lang>.definition.txt        '<offset>-<pos>|<lemma>|<definition>' (not eng)
+    """
+    rng = np.random.RandomState(seed)
+    exwn = exWordNet(root)
+    synsets = list(exwn.all_synsets())
+    if n_synsets < len(synsets):
+        synsets = [synsets[i] for i in np.sort(rng.choice(len(synsets), n_synsets, replace=False))]
+
+    if not os.path.exists(root):
+        os.makedirs(root)
+    _write_vectors('%s/synsets.txt' % root, [s.name() for s in synsets], dim, rng)
+    _write_vectors('%s/topics.txt' % root, exwn.topics(), dim, rng)
+
+    for lang in langs:
+        folder = '%s/%s' % (root, lang)
+        if not os.path.exists(folder + '/freq'):
+            os.makedirs(folder + '/freq')
+        lemmas = ['%s:%s' % (s.name(), l.name()) for s in synsets for l in s.lemmas(lang=lang)]
+        names = sorted(set(key.split(':', 1)[1] for key in lemmas))
+        _write_vectors(folder + '/lemmas.txt', lemmas, dim, rng)
+        _write_vectors(folder + '/words.txt', names, dim, rng)
+        for topic in exwn.topics():
+            counts = rng.zipf(2.0, size=len(lemmas))
+            with io.open('%s/freq/freq.%s.txt' % (folder, topic), 'w', encoding='utf-8') as f:
+                f.write('%d\n' % counts.sum())
+                for key, count in sorted(zip(lemmas, counts)):
+                    f.write('%s %d\n' % (key, count))
+        if lang != 'eng':
+            with io.open('%s/%s.definition.txt' % (root, lang), 'w', encoding='utf-8') as f:
+                for s in sorted(synsets, key=_definition_key):
+                    f.write('%s|%s|definition of %s\n' % (_definition_key(s), s.name(), s.name()))
+    exwn.close()
+    return len(synsets)
+
+###############################
+# operations
+###############################
+def _inputs(root, lang, calls, seed=1):
+    """
+    synsets, lemmas and words of the data root to call the operations with
+    """
+    rng = np.random.RandomState(seed)
+    exwn = exWordNet(root)
+    with io.open('%s/synsets.txt' % root, 'r', encoding='utf-8') as f:
+        names = [line.split(' ', 1)[0] for line in f]
+    # only synsets with lemmas in the language
+    candidates = [s for s in (exwn.synset(name) for name in names) if s.lemmas(lang=lang)]
+    synsets = [candidates[i] for i in rng.randint(len(candidates), size=calls)]
+    lemmas = []
+    words = []
+    for s in synsets:
+        lemma = s.lemmas(lang=lang)[rng.randint(len(s.lemmas(lang=lang)))]
+        lemmas.append(lemma)
+        words.append(exwn.words(lemma.name(), lang=lang)[0])
+    topics = [exwn.topics()[i] for i in rng.randint(len(exwn.topics()), size=calls)]
+    exwn.close()
+    return synsets, lemmas, words, topics
+
+def _connected(root, words):
+    """
+    pairs of the words whose association can be computed, repeated up to len(words)
+    each word is paired with the next word of the same part of speech, words
+    without common hypernym raise and would only time the failed search
+    """
+    exwn = exWordNet(root)
+    pairs = []
+    for i, a in enumerate(words):
+        b = next((w for w in words[i+1:] + words[:i] if w[1] == a[1]), None)
+        if b is None:
+            continue
+        try:
+            exwn.word(*a).association(exwn.word(*b))
+        except exWordNetError:
+            continue
+        pairs.append((a, b))
+    exwn.close()
+    if len(pairs) == 0:
+        return []
+    return (pairs*len(words))[:len(words)]
+
+def operations(root, lang, calls):
+    """
+    name -> (function of an exWordNet instance and an input, inputs)
+    """
+    synsets, lemmas, words, topics = _inputs(root, lang, calls)
+    word_keys = [(w._name, w._pos, w._lang) for w in words]
+    def_lang = lang if os.path.exists('%s/%s.definition.txt' % (root, lang)) else 'eng'
+    return [
+        ('vector.synset', lambda exwn, s: exwn.vector(s), synsets),
+        ('vector.lemma', lambda exwn, l: exwn.vector(l), lemmas),
+        ('vector.word', lambda exwn, w: exwn.vector(w), words),
+        ('lemma_freq', lambda exwn, lt: exwn.lemma_freq(*lt), list(zip(lemmas, topics))),
+        ('word.vector.topic', lambda exwn, wt: exwn.word(*wt[0]).vector(topic=wt[1]), list(zip(word_keys, topics))),
+        ('word.ambiguity', lambda exwn, wt: exwn.word(*wt[0]).ambiguity(wt[1]), list(zip(word_keys, topics))),
+        ('word.association', lambda exwn, ww: exwn.word(*ww[0]).association(exwn.word(*ww[1])),
+            _connected(root, word_keys)),
+        ('definition', lambda exwn, s: exwn.definition(s, lang=def_lang), synsets),
+    ]
+
+def _stats(first, latencies, errors, peak):
+    latencies = np.array(latencies)*1000
+    return dict(calls=len(latencies), errors=errors, first_ms=first*1000,
+                mean_ms=float(latencies.mean()), p50_ms=float(np.percentile(latencies, 50)),
+                p90_ms=float(np.percentile(latencies, 90)), p99_ms=float(np.percentile(latencies, 99)),
+                max_ms=float(latencies.max()), throughput=float(len(latencies)/(latencies.sum()/1000)),
+                peak_kb=peak/1024.0)
+
+def _call(function, exwn, x):
+    try:
+        function(exwn, x)
+        return 0
+    except exWordNetError:
+        # e.g. a key missing from the data root, the run fails if any call failed
+        return 1
+
+def bench(root, function, inputs, warmup=10):
+    """
+    latency of every call on one instance after warmup calls
+    the first call, which loads the data files, is reported on its own
+    """
+    exwn = exWordNet(root)
+    start = time.perf_counter()
+    _call(function, exwn, inputs[0])
+    first = time.perf_counter() - start
+    for x in inputs[1:warmup]:
+        _call(function, exwn, x)
+    latencies = []
+    errors = 0
+    for x in inputs:
+        start = time.perf_counter()
+        errors += _call(function, exwn, x)
+        latencies.append(time.perf_counter() - start)
+    exwn.close()
+
+    exwn = exWordNet(root)
+    tracemalloc.start()
+    for x in inputs:
+        _call(function, exwn, x)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    exwn.close()
+    return _stats(first, latencies, errors, peak)
+
+def bench_extractor(root, lang, module, runs=1):
+    """
+    full run of an extractor on copies of the synset and word vectors
+    """
+    import extractor
+    extractor_module = __import__(module)
+    extractor_class = [v for k, v in vars(extractor_module).items() if k.endswith('WordNetExtractor')][0]
+    target = '%s/extract.%s' % (root, module)
+    if not os.path.exists(target):
+        os.makedirs(target)
+    shutil.copy('%s/synsets.txt' % root, target + '/synsets.txt')
+    shutil.copy('%s/%s/words.txt' % (root, lang), target + '/words.txt')
+
+    latencies = []
+    for i in range(runs):
+        manifest = '%s/%s/manifest.json' % (target, lang)
+        if os.path.exists(manifest):
+            os.remove(manifest)
+        # the last run is traced for its peak memory
+        if i == runs - 1:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            extractor.run(extractor_class, target, [lang], mode='quiet')
+        latencies.append(time.perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # tracing slows the run down, so its time is left out if there are others
+    if runs > 1:
+        latencies = latencies[:-1]
+    return _stats(latencies[0], latencies, 0, peak)
+
+###############################
+# results
+###############################
+def describe_root(root):
+    """
+    size of the data root actually benchmarked, a root is reused as it is
+    """
+    with io.open('%s/synsets.txt' % root, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    return dict(synsets=len(lines), dim=len(lines[0].split()) - 1, compiled=is_compiled('%s/synsets.txt' % root))
+
+def compare(results, baseline, tolerance, min_ms=0.01):
+    """
+    print the ratios to the baseline, returns the operations that regressed
+    latencies that differ by less than min_ms are not counted as regressions
+    """
+    regressed = []
+    print('%-20s %10s %10s %8s %10s %10s %8s' % ('operation', 'p50 ms', 'base', 'ratio', 'peak kb', 'base', 'ratio'))
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is not None and base.get('errors', 0) > 0:
+            print('%-20s %10.3f %10s' % (name, stats['p50_ms'], 'base failed'))
+            regressed.append(name)
+            continue
+        if base is None:
+            print('%-20s %10.3f %10s' % (name, stats['p50_ms'], 'new'))
+            continue
+        time_ratio = stats['p50_ms']/max(base['p50_ms'], 1e-9)
+        peak_ratio = stats['peak_kb']/max(base['peak_kb'], 1e-9)
+        flag = ''
+        slower = time_ratio > 1 + tolerance and stats['p50_ms'] - base['p50_ms'] >= min_ms
+        if slower or peak_ratio > 1 + tolerance:
+            regressed.append(name)
+            flag = ' REGRESSED'
+        print('%-20s %10.3f %10.3f %8.2f %10.1f %10.1f %8.2f%s' % (name, stats['p50_ms'], base['p50_ms'], time_ratio,
+                                                                  stats['peak_kb'], base['peak_kb'], peak_ratio, flag))
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark the exWordNet hot paths on a synthetic data root')
+    parser.add_argument('--root', default='benchmark_data', help='synthetic data root, generated if missing')
+    parser.add_argument('--lang', default='eng')
+    parser.add_argument('--synsets', type=int, default=5000, help='synsets with vectors in a new root')
+    parser.add_argument('--dim', type=int, default=50, help='dimension of the vectors in a new root')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--calls', type=int, default=200, help='timed calls per operation')
+    parser.add_argument('--compiled', action='store_true', help='compile the vector files first')
+    parser.add_argument('--extractors', action='store_true', help='also time full runs of the extractors')
+    parser.add_argument('--runs', type=int, default=1, help='runs per extractor')
+    parser.add_argument('--only', nargs='+', default=None, help='names of the operations to run')
+    parser.add_argument('--save', default=None, help='write the results as json')
+    parser.add_argument('--baseline', default=None, help='json results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    parser.add_argument('--min-ms', type=float, default=0.01, help='smallest p50 difference counted as a slowdown')
+    args = parser.parse_args()
+
+    if not os.path.exists('%s/synsets.txt' % args.root):
+        start = time.time()
+        n = make_root(args.root, langs=[args.lang], n_synsets=args.synsets, dim=args.dim, seed=args.seed)
+        print('Generated %s: %d synsets (%.1fs)' % (args.root, n, time.time() - start))
+    if args.compiled:
+        with contextlib.redirect_stdout(io.StringIO()):
+            compile_root(args.root, [args.lang])
+
+    results = {}
+    for name, function, inputs in operations(args.root, args.lang, args.calls):
+        if args.only and name not in args.only:
+            continue
+        if len(inputs) == 0:
+            print('Skipped %s: no inputs in %s' % (name, args.root))
+            continue
+        results[name] = bench(args.root, function, inputs)
+    if args.extractors:
+        for module in ('bextractor', 'fextractor', 'fgextractor'):
+            name = 'extract.%s' % module
+            if args.only and name not in args.only:
+                continue
+            results[name] = bench_extractor(args.root, args.lang, module, args.runs)
+
+    print('%-20s %8s %8s %10s %10s %10s %10s %12s %10s' % ('operation', 'calls', 'errors', 'first ms', 'p50 ms', 'p90 ms',
+                                                           'p99 ms', 'calls/s', 'peak kb'))
+    for name, stats in results.items():
+        print('%-20s %8d %8d %10.3f %10.3f %10.3f %10.3f %12.1f %10.1f' % (name, stats['calls'], stats['errors'], stats['first_ms'],
+                                                                          stats['p50_ms'], stats['p90_ms'], stats['p99_ms'],
+                                                                          stats['throughput'], stats['peak_kb']))
+
+    # timings of failed calls say nothing about the hot paths
+    failed = [name for name, stats in results.items() if stats['errors'] > 0]
+    if failed:
+        print('FAILED: calls raised in %s, check the data root' % ', '.join(failed))
+        sys.exit(1)
+
+    config = dict(vars(args), python=platform.python_version(), numpy=np.__version__, platform=platform.platform())
+    config.update(describe_root(args.root))
+    if args.save:
+        with io.open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(dict(config=config, results=results), f, indent=2, sort_keys=True)
+        print('Saved %s' % args.save)
+
+    if args.baseline:
+        with io.open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for key in ('synsets', 'dim', 'calls', 'compiled', 'lang'):
+            if baseline['config'].get(key) != config[key]:
+                print('WARNING: %s is %r in the baseline, %r now' % (key, baseline['config'].get(key), config[key]))
+        regressed = compare(results, baseline['results'], args.tolerance, args.min_ms)
+        if regressed:
+            print('REGRESSED: %s' % ', '.join(regressed))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Import time budget of the exWordNet modules
+#
+# python benchmarks/startup_benchmark.py [--runs N] [--budget SECONDS]
+# every module is imported in a new interpreter, the median import time must
+# stay within the budget and importing must not load nltk or WordNet, which
+# are only needed on first use; the exit status is 1 if a module fails
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = ['exWordNet', 'vectorstore', 'annindex', 'sharedstore', 'asyncexwordnet',
+           'extractor', 'bextractor', 'fextractor', 'fgextractor']
+
+# run in the new interpreter, prints the import time and whether nltk was loaded
+_SNIPPET = '''
+import sys, time
+start = time.perf_counter()
+import %s
+print(time.perf_counter() - start, 'nltk' in sys.modules)
+'''
+
+def import_time(module):
+    """
+    seconds to import the module in a new interpreter, and whether nltk was imported
+    """
+    out = subprocess.check_output([sys.executable, '-c', _SNIPPET % module], cwd=ROOT)
+    seconds, nltk = out.decode('utf-8').split()
+    return float(seconds), nltk == 'True'
+
+def main():
+    parser = argparse.ArgumentParser(description='check the import time of the exWordNet modules')
+    parser.add_argument('--runs', type=int, default=5, help='imports per module, the median is used')
+    parser.add_argument('--budget', type=float, default=0.3, help='allowed import time in seconds')
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    args = parser.parse_args()
+
+    failed = []
+    print('%-16s %10s %8s' % ('module', 'seconds', 'nltk'))
+    for module in args.modules:
+        runs = [import_time(module) for _ in range(args.runs)]
+        seconds = sorted(t for t, nltk in runs)[len(runs)//2]
+        nltk = any(nltk for t, nltk in runs)
+        flag = ''
+        if seconds > args.budget or nltk:
+            failed.append(module)
+            flag = ' OVER BUDGET' if seconds > args.budget else ' IMPORTS NLTK'
+        print('%-16s %10.3f %8s%s' % (module, seconds, nltk, flag))
+
+    if failed:
+        print('FAILED: %s' % ', '.join(failed))
+        sys.exit(1)
+    print('OK: all modules import within %.2fs' % args.budget)
+
+if __name__ == '__main__':
+    main()
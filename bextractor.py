@@ -1,29 +1,14 @@
 # Python Version of WordNetExtractor.java
 import os
-import sys
-#exWordNet
-from exWordNet import exWordNet
-
-import codecs
+from extractor import (Progress, check_inputs, export_npz, load_vector_line, open_output, parse_args,
+                       previous_run, print_timings, rewrite_vectors, run, timed, wordnet, write_manifest)
 
 class ExtractorError(Exception):
     """An exception class for wordnet-related errors."""
 
-wn = exWordNet('./')
-
-def load_vector_line(file_name):
-    model = {}
-    f = open(file_name, 'r')
-    for line in f.readlines():
-        name = line.strip().split(' ')[0]
-        vector_line = line.strip().split(' ')[1:]
-        vector_line = ' '.join(vector_line)
-        model[name] = vector_line
-    return model
-
 class BackwardWordNetExtractor:
-    def __init__(self, root, lang):
-        if lang in wn.langs():
+    def __init__(self, root, lang, mode='progress'):
+        if lang in wordnet().langs():
             self.lang = lang
         else:
             raise ExtractorError("language: '%s' is not supported, try another language" % lang)
@@ -39,36 +24,82 @@ class BackwardWordNetExtractor:
         #initialize
         self.WordIndex = {}
         self.SynsetIndex = {}
+        # objects walked by extractWordsAndSynsets, reused for the relations
+        self.words = {}
         self.pos_list = ['a', 'r', 'n', 'v']
+        # 'progress', 'quiet' or 'verbose', see extractor.Progress
+        self.mode = mode
+        # seconds spent in each stage
+        self.timings = {}
+        # set by extractor.check_inputs, see there
+        self.plan = 'full'
+        # target indexes that already had lexemes before an 'append' run
+        self.covered = set()
         self.pointer_map = {"@":"hypernym", "&":"similar", "$":"verbGroup", "!":"antonym", None:"synonym"}
 
     def main(self):
-        # Load vector line
-        self.model = load_vector_line(self.file_name)
-        ver = wn.get_version()
+        check_inputs(self)
+        if self.plan is None:
+            print("UP TO DATE: " + self.folder)
+            return
+        if self.plan == 'vectors':
+            with timed(self.timings, 'rewrite vectors'):
+                rewrite_vectors(self)
+        else:
+            self.extractWords()
+            with timed(self.timings, 'relations'):
+                self.extractRelations()
+            with timed(self.timings, 'export npz'):
+                export_npz(self)
+        write_manifest(self)
+
+        print_timings(self.lang, self.timings)
+        print("DONE")
+
+    def extractWords(self):
+        # index the vector lines, the vectors are read when they are written
+        with timed(self.timings, 'load vectors'):
+            self.model = load_vector_line(self.file_name)
+        ver = wordnet().get_version()
         print("RESOURCE: WN " + str(ver) + "\n")
         print("LANGUAGE: "+self.lang+"\n")
         print("VECTORS: " + self.file_name + "\n")
         print("TARGET: " + self.folder + "\n")
-        self.extractWordsAndSynsets(self.folder + "/words.txt",self.folder + "/synsets.txt",self.folder + "/lexemes.txt")
-        self.extractWordRelations(self.folder + "/hypernym.txt", '@')
-        self.extractWordRelations(self.folder + "/similar.txt",  '&')
-        self.extractWordRelations(self.folder + "/synonym.txt",  None)
-        self.extractWordRelations(self.folder + "/verbGroup.txt",  '$')
-        self.extractWordRelations(self.folder + "/antonym.txt",  '!')
-
-        print("DONE")
-
+        print("PLAN: " + self.plan + "\n")
+        # in an 'append' run the new entries continue the previous indexes
+        self.SynsetIndex, self.covered = previous_run(self)
+        self.appendFrom = len(self.SynsetIndex)
+        with timed(self.timings, 'words and synsets'):
+            self.extractWordsAndSynsets(self.folder + "/words.txt",self.folder + "/synsets.txt",self.folder + "/lexemes.txt")
+        self.model.close()
+
+    def wordnet_version(self):
+        return wordnet().get_version()
+
+    def relation_files(self):
+        return [
+            (self.folder + "/hypernym.txt", '@'),
+            (self.folder + "/similar.txt", '&'),
+            (self.folder + "/synonym.txt", None),
+            (self.folder + "/verbGroup.txt", '$'),
+            (self.folder + "/antonym.txt", '!'),
+        ]
+
+    def matrix_files(self):
+        # lexemes.txt pairs are (synset, word), the synsets carry the vectors
+        return self.folder + "/synsets.txt", self.folder + "/words.txt"
 
     def extractWordsAndSynsets(self, filenameWords, filenameSynsets,  filenameLexemes):
         #file
-        fWords = codecs.open(filenameWords, 'w', 'utf-8')
-        fSynsets = codecs.open(filenameSynsets, 'w',  'utf-8')
-        fLexemes = codecs.open(filenameLexemes, 'w',  'utf-8')
+        append = self.plan == 'append'
+        fWords = open_output(filenameWords)
+        fSynsets = open_output(filenameSynsets, append)
+        fLexemes = open_output(filenameLexemes, append)
+        progress = Progress('%s words' % self.lang, self.mode)
 
         wordCounter = 0
         wordCounterAll = 0
-        synsetCounter = 0
+        synsetCounter = len(self.SynsetIndex)
         lexemCounter = 0
         lexemCounterAll = 0
 
@@ -85,9 +116,11 @@ class BackwardWordNetExtractor:
             _synsetCounter[pos] = 0
             _lexemCounter[pos] = 0
             _lexemCounterAll[pos] = 0
-            ovv[pos] = []
-            for word in wn.all_words(pos=pos, lang=self.lang):
-                print(word)
+            ovv[pos] = set()
+            self.words[pos] = []
+            for word in wordnet().all_words(pos=pos, lang=self.lang):
+                self.words[pos].append(word)
+                progress.update(word)
                 wordCounterAll += 1
                 _wordCounterAll[pos] += 1
                 wordId = '%s.%s' % (word.name(), word.pos())
@@ -99,7 +132,7 @@ class BackwardWordNetExtractor:
                     _lexemCounterAll[pos] += 1
                     synsetId = synset.name()
 
-                    if synsetId in self.model.keys():
+                    if synsetId in self.model:
                         synsetInWord += 1
                         if synsetId not in self.SynsetIndex:
                             fSynsets.write('%s %s\n' % (synsetId, self.model[synsetId]))
@@ -112,11 +145,11 @@ class BackwardWordNetExtractor:
                         lexemeId = '%s.%s' % (synset.name(), word.name())
 
                         fWords.write('%s,' % lexemeId)
-                        fLexemes.write('%d %d\n' % (self.SynsetIndex[synsetId], wordCounterAll))
+                        if self.SynsetIndex[synsetId] > self.appendFrom:
+                            fLexemes.write('%d %d\n' % (self.SynsetIndex[synsetId], wordCounterAll))
 
                     else:
-                        if synsetId not in ovv[pos]:
-                            ovv[pos].append(synsetId)
+                        ovv[pos].add(synsetId)
 
                 fWords.write('\n')
                 if synsetInWord != 0:
@@ -132,48 +165,67 @@ class BackwardWordNetExtractor:
         fWords.close()
         fSynsets.close()
         fLexemes.close()
-
-    def extractWordRelations(self, filename, relation_symbol):
-        affectedPOS = {}
-        f = codecs.open(filename, 'w', 'utf-8')
-        for pos in self.pos_list:
-            for word in wn.all_words(pos=pos):
+        progress.close()
+
+    def extractRelations(self, pos_list=None, suffix=''):
+        """
+        walk the words once and write all relation files at the same time
+        """
+        if pos_list is None:
+            pos_list = self.pos_list
+        relations = []
+        for filename, relation_symbol in self.relation_files():
+            # part files of a parallel run are appended when they are merged
+            append = self.plan == 'append' and not suffix
+            relations.append((open_output(filename + suffix, append), relation_symbol, {}))
+        progress = Progress('%s relations' % self.lang, self.mode)
+
+        for pos in pos_list:
+            for word in self._words(pos):
+                progress.update(word)
                 wordId = '%s.%s' % (word.name(), word.pos())
-                # get related words
-                if relation_symbol == None:
-                    targetWords = word._related()
-                else:
-                    targetWords = word._related(relation_symbol)
-
-                for targetWord in targetWords:
-                    pos = targetWord.pos()
-                    targetWordId = '%s.%s' % (targetWord.name(), targetWord.pos())
-
-                    if pos in affectedPOS:
-                        affectedPOS[pos] += 1
-                    else:
-                        affectedPOS[pos] = 1
-
-                    if wordId in self.WordIndex and targetWordId in self.WordIndex:
-                        if self.WordIndex[wordId] >= 0 and self.WordIndex[targetWordId] >= 0:
-                            f.write('%d %d\n' % (self.WordIndex[wordId], self.WordIndex[targetWordId]))
+                for f, relation_symbol, affectedPOS in relations:
+                    # get related words
+                    if relation_symbol == None:
+                        targetWords = word._related()
                     else:
-                        print(wordId, targetWordId)
-        f.close()
-        print("Extracted %s: done!\n" % self.pointer_map[relation_symbol])
-
-        for k,v in affectedPOS.items():
-            print("  %s: %d\n" % (k, v))
+                        targetWords = word._related(relation_symbol)
+
+                    for targetWord in targetWords:
+                        targetPos = targetWord.pos()
+                        targetWordId = '%s.%s' % (targetWord.name(), targetWord.pos())
+
+                        if targetPos in affectedPOS:
+                            affectedPOS[targetPos] += 1
+                        else:
+                            affectedPOS[targetPos] = 1
+
+                        if wordId in self.WordIndex and targetWordId in self.WordIndex:
+                            source, target = self.WordIndex[wordId], self.WordIndex[targetWordId]
+                            # pairs between covered words were written by the previous run
+                            if source >= 0 and target >= 0 and not (source in self.covered and target in self.covered):
+                                f.write('%d %d\n' % (source, target))
+                        else:
+                            print(wordId, targetWordId)
+
+        progress.close()
+        for f, relation_symbol, affectedPOS in relations:
+            f.close()
+            print("Extracted %s: done!\n" % self.pointer_map[relation_symbol])
+
+            for k,v in affectedPOS.items():
+                print("  %s: %d\n" % (k, v))
+
+    def _words(self, pos):
+        # words built by extractWordsAndSynsets, or walk WordNet again
+        # when the relations are extracted in another process
+        if pos in self.words:
+            return self.words[pos]
+        return wordnet().all_words(pos=pos, lang=self.lang)
 
 if __name__ == '__main__':
-    # get root
-    root = sys.argv[1]
-    # get languages
-    langs = sys.argv[2:]
-
-    for lang in langs:
-        bwne = BackwardWordNetExtractor(root, lang)
-        bwne.main()
+    args = parse_args('extract words, synsets and relations for AutoExtend (backward)')
+    run(BackwardWordNetExtractor, args.root, args.langs, jobs=args.jobs, mode=args.mode)
 
     #List of Languages
     #     ['als', 'arb', 'cat', 'cmn', 'dan', 'eng', 'eus', 'fas',
@@ -1,12 +1,81 @@
-from nltk.corpus import wordnet as wn
-from nltk.util import binary_search_file
+import itertools
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import numpy as np
 
+from vectorstore import (VectorStore, add_to_store, add_to_vector_file, compile_vector_file, compiled_paths,
+                         create_store, discard_store, finish_store, is_compiled)
+from annindex import IVFIndex, index_path, is_indexed
+from sharedstore import SharedData, SharedFreqTable, SharedIndex, SharedVectorStore, encode_keys
+
 class exWordNetError(Exception):
     """An exception class for wordnet-related errors."""
 
+class _LazyWordNet(object):
+    """
+    nltk.corpus.wordnet, imported on first use
+    importing nltk takes longer than the rest of this module, and tools which
+    only read vectors never need it
+    """
+    def __getattr__(self, name):
+        global wn
+        from nltk.corpus import wordnet
+        wn = wordnet
+        return getattr(wordnet, name)
+
+wn = _LazyWordNet()
+
+def binary_search_file(f, key):
+    # nltk.util.binary_search_file, imported on first use like wn
+    global binary_search_file
+    from nltk.util import binary_search_file
+    return binary_search_file(f, key)
+
 def _relatedness(v_in, v_out):
-    return sum(v_in*v_out)/np.sqrt(sum(v_in*v_in)*sum(v_out*v_out))
+    return np.dot(v_in, v_out)/np.sqrt(np.dot(v_in, v_in)*np.dot(v_out, v_out))
+
+def _ambiguity_weight(f, delta):
+    """
+    weighting function of ambiguity for frequencies normalized by their maximum
+    f^d / (f^d + (1-f)^d)^(1/d), evaluated on the whole array at once
+    """
+    fd = np.power(f, delta)
+    return fd/np.power(fd + np.power(1-f, delta), 1/delta)
+
+def _normalize_rows(matrix):
+    """
+    scale rows to unit length, zero rows stay zero
+    """
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    norms[norms == 0] = 1
+    return matrix/norms[:, np.newaxis]
+
+# synset key '{offset:08d}-{pos}' in a line of a definition file
+_DEFINITION_KEY = re.compile(r'\b(\d{8}-[nvasr])\b')
+# topic names are used in file names and as keys of topics.txt
+_TOPIC_NAME = re.compile(r'[\w\-]+\Z')
+
+def _load_definitions(file_name):
+    """
+    read a definition file into a dict of synset key -> definition
+    the key is the first synset key in the line, the definition the last '|' field
+    """
+    definitions = {}
+    with open(file_name, 'r') as f:
+        for line in f:
+            m = _DEFINITION_KEY.search(line)
+            if m is None:
+                continue
+            # the first line for a synset wins, as it did with search_line
+            definitions.setdefault(m.group(1), line.strip().split('|')[-1])
+    return definitions
 
 def search_line(f, key):
     for line in f.readlines():
@@ -16,6 +85,269 @@ def search_line(f, key):
             continue
     return None
 
+_clock = time.perf_counter
+
+class _Instrumentation(object):
+    """
+    counts and seconds of the instrumented events of one exWordNet
+      open            a data file is opened
+      search          binary search in a text file
+      scan            pass over a text file for many keys
+      parse           vector parsed from a line of text
+      resource.hit    loaded resource (store, table, ...) reused
+      resource.load   resource loaded
+      hypernym.hit    hypernym distances of a synset found in the cache
+      hypernym.miss   hypernym distances walked in the NLTK graph
+      word.hit        interned Word reused
+      word.miss       new Word created
+      shortest_path   shortest path distance between two sets of synsets
+    disabled by default, instrumented code only checks the enabled attribute
+    while enabled, callbacks are called as callback(event, seconds, detail)
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._seconds = {}
+        self._callbacks = ()
+
+    def record(self, event, seconds=0.0, detail=None):
+        with self._lock:
+            self._counts[event] = self._counts.get(event, 0) + 1
+            self._seconds[event] = self._seconds.get(event, 0.0) + seconds
+        for callback in self._callbacks:
+            callback(event, seconds, detail)
+
+    def snapshot(self):
+        with self._lock:
+            return dict((event, {'count': count, 'seconds': self._seconds[event]})
+                        for event, count in self._counts.items())
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+            self._seconds = {}
+
+    def add_callback(self, callback):
+        with self._lock:
+            self._callbacks = self._callbacks + (callback,)
+
+    def remove_callback(self, callback):
+        with self._lock:
+            self._callbacks = tuple(c for c in self._callbacks if c is not callback)
+
+class _DataFilePool(object):
+    """
+    read-only handles and loaded resources for the data files of one exWordNet
+    every handle has its own lock because a search moves the file position,
+    resources (compiled stores, tables, ...) are loaded once and shared
+    """
+    def __init__(self, instrumentation=None):
+        self._lock = threading.RLock()
+        self._handles = {}
+        self._resources = {}
+        # key -> lock held while the resource for key is loaded
+        self._loading = {}
+        self._closed = False
+        self._instrumentation = instrumentation or _Instrumentation()
+
+    def _check(self):
+        if self._closed:
+            raise exWordNetError('data files are already closed')
+
+    @contextmanager
+    def locked(self, file_name):
+        """
+        yield the pooled handle for the file while holding its lock
+        """
+        instrumentation = self._instrumentation
+        with self._lock:
+            self._check()
+            if file_name not in self._handles:
+                start = _clock() if instrumentation.enabled else None
+                self._handles[file_name] = (open(file_name, 'r'), threading.Lock())
+                if start is not None:
+                    instrumentation.record('open', _clock() - start, file_name)
+            f, lock = self._handles[file_name]
+        with lock:
+            yield f
+
+    def search(self, file_name, key):
+        """
+        binary search the sorted file for the line starting with key
+        """
+        instrumentation = self._instrumentation
+        start = _clock() if instrumentation.enabled else None
+        with self.locked(file_name) as f:
+            line = binary_search_file(f, key)
+        if start is not None:
+            instrumentation.record('search', _clock() - start, file_name)
+        return line
+
+    def resource(self, key, loader):
+        """
+        return the resource for key, calling loader the first time only
+        """
+        instrumentation = self._instrumentation
+        with self._lock:
+            self._check()
+            if key in self._resources:
+                if instrumentation.enabled:
+                    instrumentation.record('resource.hit', 0.0, key)
+                return self._resources[key]
+            load_lock = self._loading.setdefault(key, threading.RLock())
+        # the pool lock is not held while loading, so the other resources stay
+        # available, only callers of the same key wait for the first load
+        with load_lock:
+            with self._lock:
+                self._check()
+                if key in self._resources:
+                    if instrumentation.enabled:
+                        instrumentation.record('resource.hit', 0.0, key)
+                    return self._resources[key]
+            start = _clock() if instrumentation.enabled else None
+            resource = loader()
+            if start is not None:
+                instrumentation.record('resource.load', _clock() - start, key)
+            with self._lock:
+                if self._closed:
+                    if hasattr(resource, 'close'):
+                        resource.close()
+                    self._check()
+                self._resources[key] = resource
+                self._loading.pop(key, None)
+            return resource
+
+    def items(self):
+        """
+        (key, resource) of the loaded resources
+        """
+        with self._lock:
+            return list(self._resources.items())
+
+    def put(self, key, resource):
+        """
+        use resource for key instead of loading it
+        """
+        with self._lock:
+            self._check()
+            self._resources[key] = resource
+
+    def discard(self, key):
+        """
+        forget the resource for key so that it is loaded again
+        """
+        with self._lock:
+            self._resources.pop(key, None)
+
+    def close(self):
+        with self._lock:
+            for f, lock in self._handles.values():
+                with lock:
+                    f.close()
+            for resource in self._resources.values():
+                if hasattr(resource, 'close'):
+                    resource.close()
+            self._handles = {}
+            self._resources = {}
+            self._loading = {}
+            self._closed = True
+
+class _LRUCache(object):
+    """
+    thread-safe mapping which keeps only the maxsize most recently used items
+    hits and misses are recorded as <name>.hit and <name>.miss
+    """
+    def __init__(self, maxsize, instrumentation=None, name='cache'):
+        self._maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._instrumentation = instrumentation or _Instrumentation()
+        self._name = name
+
+    def get(self, key, loader):
+        instrumentation = self._instrumentation
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                if instrumentation.enabled:
+                    instrumentation.record(self._name + '.hit', 0.0, key)
+                return self._items[key]
+        start = _clock() if instrumentation.enabled else None
+        value = loader()
+        if start is not None:
+            instrumentation.record(self._name + '.miss', _clock() - start, key)
+        with self._lock:
+            self._items[key] = value
+            if len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+class _FreqTable(object):
+    """
+    lemma frequencies of one freq file
+    the header line holds the total, the rest is "<synset>:<lemma> <count>"
+    keys are kept sorted with a parallel count array and a key -> row index
+    """
+    def __init__(self, file_name):
+        keys = []
+        counts = []
+        with open(file_name, 'r') as f:
+            total = int(f.readline().split(' ')[0])
+            assert total > 0
+            for line in f:
+                tokens = line.strip().split(' ')
+                if len(tokens) < 2:
+                    continue
+                keys.append(tokens[0])
+                counts.append(int(tokens[1]))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._total = total
+        self._keys = [keys[i] for i in order]
+        self._counts = np.array(counts, dtype=np.int64)[order]
+        self._index = dict(zip(self._keys, range(len(self._keys))))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def total(self):
+        return self._total
+
+    def keys(self):
+        return self._keys
+
+    def counts(self):
+        return self._counts
+
+    def count(self, key):
+        i = self._index.get(key)
+        if i is None:
+            return 0
+        return int(self._counts[i])
+
+    def freq(self, key):
+        i = self._index.get(key)
+        if i is None:
+            return 0
+        return int(self._counts[i])/self._total
+
+    def freqs(self, keys):
+        """
+        normalized frequencies for many keys, zero for keys not found
+        """
+        rows = np.fromiter((self._index.get(k, -1) for k in keys), dtype=np.int64)
+        found = rows >= 0
+        freqs = np.zeros(len(rows))
+        freqs[found] = self._counts[rows[found]]/self._total
+        return freqs
+
 class Word(object):
     # used in ambiguity which is for weighting function
     _DELTA = 0.65
@@ -23,17 +355,24 @@ class Word(object):
     # the bigger k is, the more specific associations may be appear
     _k = 0.5
 
-    def __init__(self, exwordnet, name, pos, lang='eng'):
+    # words are created in large numbers, so no per-instance __dict__
+    __slots__ = ('_exwordnet', '_name', '_pos', '_lang', '__weakref__')
+
+    def __init__(self, exwordnet, name, pos, lang='eng', validate=True):
         self._exwordnet = exwordnet
-        if name not in wn.all_lemma_names(pos=pos, lang=lang):
+        # words coming from WordNet iteration are known to exist
+        if validate and not exwordnet._is_lemma_name(name, pos, lang):
             raise exWordNetError('word %s.%s in %s is not defined in WordNet' % (name, pos, lang))
 
         self._name = name
         self._pos = pos
         self._lang = lang
-        self._key = '%s.%s.%s' % (name, pos, lang)
         # self._vector = self.exwordnet._vector(self)
 
+    @property
+    def _key(self):
+        return '%s.%s.%s' % (self._name, self._pos, self._lang)
+
     def name(self):
         return self._name
 
@@ -56,14 +395,12 @@ class Word(object):
         if topic == None:
             vector = self._exwordnet.vector(self)
         else:
-            vector = np.zeros(300)
-            for l in self.lemmas():
-                try:
-                    vector += self._exwordnet.lemma_freq(l, topic)*self._exwordnet.vector(l)
-                except exWordNetError:
-                    continue
+            # precomputed by exWordNet.build_topic_word_vectors if available
+            vector = self._exwordnet._topic_word_vector(self, topic)
+            if vector is None:
+                vector = self._exwordnet._topic_word_matrix([self], topic)[0]
 
-        if sum(vector*vector)==0:
+        if np.dot(vector, vector)==0:
             raise exWordNetError('vector for %r in %r is not properly calculated' % (self, topic))
 
         return vector
@@ -72,15 +409,10 @@ class Word(object):
     # Calc AMBIGUITY
     ###############################
     def ambiguity(self, topic='general'):
-        f = []
-        for l in self.lemmas():
-            f.append(self._exwordnet.lemma_freq(l, topic))
-        try:
-            f = np.array(f)/max(f)
-            ambiguity = sum([np.power(v, self._DELTA)/(np.power(np.power(v, self._DELTA)+np.power((1-v), self._DELTA),1/self._DELTA)) for v in f])
-            return ambiguity
-        except ZeroDivisionError:
+        f = self._exwordnet.lemma_freqs(self.lemmas(), topic)
+        if len(f) == 0 or f.max() == 0:
             raise exWordNetError('all frequency are 0 for %r' % self)
+        return float(np.sum(_ambiguity_weight(f/f.max(), self._DELTA)))
 
     ###############################
     # Calc TOPIC RELATEDNESS
@@ -95,17 +427,12 @@ class Word(object):
     ###############################
     def association(self, other, topic=None, index=False):
         rel = _relatedness(self.vector(topic=topic), other.vector(topic=topic))
-        sps = []
-        for s1 in self.synsets():
-            for s2 in other.synsets():
-                sp = s1.shortest_path_distance(s2)
-                sps.append(sp)
+        # shortest path distance over all pairs of synsets of the two words
+        sp = self._exwordnet._shortest_path_distance(self.synsets(), other.synsets())
 
-        if len(sps)==0:
+        if sp == None:
             raise exWordNetError('%r and %r are not connected' % (self, other))
 
-        sp = min(sps)
-
         # return calculated index or just relatedness and shortest path distance
         if index:
             return rel*np.log(1+sp/self._k)
@@ -127,22 +454,30 @@ class Word(object):
                         if l.name()!=self._name:
                             rws.append(l.name())
 
-        return sorted(list(map(lambda x: Word(self._exwordnet, x, self._pos, lang=self._lang), list(set(rws)))))
+        return sorted(list(map(lambda x: self._exwordnet.word(x, self._pos, lang=self._lang), list(set(rws)))))
 
     def __repr__(self):
         tup = type(self).__name__, self._key
         return "%s('%s')" % tup
 
     def __hash__(self):
-        return hash(self._name)
+        return hash((self._name, self._pos, self._lang))
 
     def __eq__(self, other):
-        return self._key == other._key
+        if self is other:
+            return True
+        if not isinstance(other, Word):
+            return NotImplemented
+        return (self._name, self._pos, self._lang) == (other._name, other._pos, other._lang)
 
     def __ne__(self, other):
-        return self._key != other._key
+        eq = self.__eq__(other)
+        if eq is NotImplemented:
+            return eq
+        return not eq
 
     def __lt__(self, other):
+        # order by key so that sorted words keep the 'name.pos.lang' order
         return self._key < other._key
 
 class exWordNet(object):
@@ -161,19 +496,248 @@ class exWordNet(object):
       iterator for all word objects which can be limited by pos
     * vector(obj)
       find vector for the object
+    * vectors(objs)
+      find vectors for many objects as a matrix with a mask of found objects
     * lemma_freq(lemma, topic)
       find frequency for the lemma in the topic
+    * lemma_freqs(lemmas, topic)
+      find frequencies for many lemmas in the topic at once
+    * ambiguities(words, topic)
+      ambiguity of many words in the topic at once
     * topic_vector(topic)
       find vector for the topic
+    * register_topic(topic, freq, lang, overwrite)
+      add a new topic from a freq file or a mapping of lemma counts
+    * topic_relatedness_all(topic, pos, lang)
+      topic relatedness of every word of the language at once
+    * build_topic_word_vectors(lang, topics)
+      precompute topic vectors of all words used by Word.vector(topic)
+    * relatedness_matrix(objs_a, objs_b)
+      cosine similarity between two lists of objects
+    * associations(word, others, topic)
+      association of the word with many other words
+    * most_similar(obj, k, kind, lang, approximate, nprobe)
+      find the k most similar synsets, lemmas or words to the object
+    * build_ann_index(kind, lang, nlist)
+      build the approximate nearest neighbour index for most_similar
+
+    vector lookups use the compiled store (see vectorstore.py)
+    when one exists next to the text vector file
+
+    data files are opened once and kept until close() is called,
+    exWordNet can also be used as a context manager
+
+    exWordNet(root, instrument=True) or instrument() counts and times
+    file accesses, cache hits and misses, parses and shortest path calls,
+    read them with stats() or receive them with add_stats_callback(callback)
+
+    publish_shared() copies the loaded stores and frequency tables into shared
+    memory once, attach_shared(name) lets other processes read them in place
 
     """
     _TOPICS = ['general', 'automotive', 'fashion', 'music']
+    # dimension of vectors in the text vector files
+    _DIM = 300
+    # number of synsets whose hypernym distances are kept for association
+    _HYPERNYM_CACHE_SIZE = 20000
+    # up to this many keys, vectors() binary searches an uncompiled file
+    # instead of reading it through
+    _SEARCH_LIMIT = 64
 
-    def __init__(self, root):
+    def __init__(self, root, instrument=False):
         self._root = root
+        # counts and timings of data file accesses, caches and parses, see stats()
+        self._instrumentation = _Instrumentation()
+        self._instrumentation.enabled = instrument
+        # opened data files and loaded resources, shared between threads
+        self._pool = _DataFilePool(self._instrumentation)
+        # synset -> {ancestor: distance}
+        self._hypernym_distances = _LRUCache(self._HYPERNYM_CACHE_SIZE, self._instrumentation, 'hypernym')
+        # (name, pos, lang) -> Word, equal words are shared while in use
+        self._words = weakref.WeakValueDictionary()
+        self._words_lock = threading.Lock()
+        # (pos, lang) -> set of lemma names, built on first use
+        self._lemma_names = {}
+        self._lemma_names_lock = threading.Lock()
+
+    def close(self):
+        """
+        close all data files opened by this instance
+        """
+        self._pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    ###############################
+    # Instrumentation
+    ###############################
+    def instrument(self, enabled=True):
+        """
+        turn counting and timing of the hot paths on or off
+        """
+        self._instrumentation.enabled = enabled
+
+    def stats(self):
+        """
+        snapshot of the instrumented events, {event: {'count': n, 'seconds': s}}
+        see _Instrumentation for the events
+        """
+        return self._instrumentation.snapshot()
+
+    def reset_stats(self):
+        self._instrumentation.reset()
+
+    def add_stats_callback(self, callback):
+        """
+        call callback(event, seconds, detail) for every event while instrumented
+        detail is the file name or key of the event, or None
+        """
+        self._instrumentation.add_callback(callback)
+
+    def remove_stats_callback(self, callback):
+        self._instrumentation.remove_callback(callback)
 
     def topics(self):
-        return self._TOPICS
+        """
+        built-in topics followed by the topics added with register_topic
+        """
+        topics = list(self._TOPICS)
+        topics.extend(t for t in self._topic_keys() if t not in self._TOPICS)
+        return topics
+
+    def _topic_keys(self):
+        """
+        keys of the topic vectors, from the compiled store or from topics.txt
+        """
+        topics_file = '%s/topics.txt' % self._root
+        def load():
+            store = self._vector_store(topics_file)
+            if store is not None:
+                return list(store.keys())
+            keys = []
+            if os.path.exists(topics_file):
+                with open(topics_file, 'r', encoding='utf-8') as f:
+                    keys = [line.split(' ', 1)[0] for line in f if line.strip()]
+            return keys
+        return self._pool.resource(('topics', topics_file), load)
+
+    def _check_topic(self, topic):
+        # if wrong topic is entered, then raise error
+        if topic not in self._TOPICS and topic not in self.topics():
+            raise exWordNetError('%s is not registered as a topic' % topic)
+
+    def register_topic(self, topic, freq, lang='eng', chunk_size=10000, overwrite=False):
+        """
+        register a new topic from lemma frequencies of the language
+        freq is either a freq file in the layout of <lang>/freq/freq.<topic>.txt
+        (total in the header, then "<synset>:<lemma> <count>" lines)
+        or a mapping of '<synset>:<lemma>' keys or Lemma objects to counts
+
+        the topic vector, the frequency weighted sum of the lemma vectors, is
+        accumulated chunk by chunk and added to topics.txt, kept sorted, and
+        to the compiled topic store, then the freq file is saved under root,
+        so that every per-topic method accepts the new topic
+        frequencies exist for lang only, for words of other languages the
+        frequency based methods raise exWordNetError
+        an existing topic, built-in or registered, is only replaced with
+        overwrite=True, its precomputed topic word vectors are removed
+        """
+        if not isinstance(topic, str) or not _TOPIC_NAME.match(topic):
+            raise exWordNetError('%r is not a valid topic name' % topic)
+        freq_file = self._freq_file(lang, topic)
+        if not overwrite and (topic in self.topics() or os.path.exists(freq_file)):
+            raise exWordNetError('topic %s already exists, use overwrite=True to replace it' % topic)
+        if not os.path.isdir(os.path.dirname(freq_file)):
+            os.makedirs(os.path.dirname(freq_file))
+
+        # the freq file is only saved once the topic vector is computed
+        if isinstance(freq, str):
+            source = freq
+        else:
+            counts = {}
+            for lemma, count in freq.items():
+                if not isinstance(lemma, str):
+                    lemma = '%s:%s' % (lemma._synset._name, lemma._name)
+                counts[lemma] = counts.get(lemma, 0) + int(count)
+            total = sum(counts.values())
+            if total <= 0:
+                raise exWordNetError('all frequency are 0 for topic %s' % topic)
+            source = freq_file + '.tmp'
+            with open(source, 'w') as f:
+                f.write('%d\n' % total)
+                for key in sorted(counts):
+                    f.write('%s %d\n' % (key, counts[key]))
+        try:
+            vector = self._freq_topic_vector(source, lang, topic, chunk_size)
+            if source == freq_file + '.tmp':
+                os.replace(source, freq_file)
+            elif os.path.abspath(source) != os.path.abspath(freq_file):
+                shutil.copyfile(source, freq_file)
+        finally:
+            if os.path.exists(freq_file + '.tmp'):
+                os.remove(freq_file + '.tmp')
+        self._pool.discard(('freq', freq_file))
+
+        # topic word vectors computed from the old frequencies
+        topic_word_file = self._topic_word_file(lang, topic)
+        self._pool.discard(('store', topic_word_file))
+        for path in compiled_paths(topic_word_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+        topics_file = '%s/topics.txt' % self._root
+        if os.path.exists(topics_file) or not is_compiled(topics_file):
+            # kept in topics.txt as well, so compiling it again keeps the topic
+            add_to_vector_file(topics_file, topic, vector)
+            compile_vector_file(topics_file)
+        else:
+            # a root with the compiled store only
+            add_to_store(topics_file, topic, vector)
+        self._pool.discard(('store', topics_file))
+        self._pool.discard(('topics', topics_file))
+        return vector
+
+    def _freq_topic_vector(self, freq_file, lang, topic, chunk_size):
+        """
+        stream over the freq file, adding count*vector chunk by chunk
+        """
+        lemmas_file = '%s/%s/lemmas.txt' % (self._root, lang)
+        vector = None
+        with open(freq_file, 'r') as f:
+            total = int(f.readline().split(' ')[0])
+            tokens = (line.strip().split(' ') for line in f)
+            tokens = (t for t in tokens if len(t) >= 2)
+            while True:
+                chunk = list(itertools.islice(tokens, chunk_size))
+                if len(chunk) == 0:
+                    break
+                vectors = self._key_vectors(lemmas_file, [t[0] for t in chunk])
+                if not vectors.any():
+                    continue
+                counts = np.array([int(t[1]) for t in chunk], dtype=np.float64)
+                chunk_vector = np.dot(counts, vectors)
+                vector = chunk_vector if vector is None else vector + chunk_vector
+        if vector is None or np.dot(vector, vector) == 0:
+            raise exWordNetError('no lemma vector for topic %s' % topic)
+        return vector/total
+
+    def _is_lemma_name(self, name, pos, lang='eng'):
+        """
+        check whether name is a lemma name of pos in lang
+        the set of lemma names is built once per pos and language
+        """
+        key = pos, lang
+        names = self._lemma_names.get(key)
+        if names is None:
+            with self._lemma_names_lock:
+                if key not in self._lemma_names:
+                    self._lemma_names[key] = frozenset(wn.all_lemma_names(pos=pos, lang=lang))
+                names = self._lemma_names[key]
+        return name in names
 
     def langs(self):
         return wn.langs()
@@ -182,7 +746,22 @@ class exWordNet(object):
         return wn.get_version()
 
     def word(self, name, pos, lang='eng'):
-        word = Word(self, name, pos, lang=lang)
+        word = self._word(name, pos, lang=lang)
+        return word
+
+    def _word(self, name, pos, lang='eng', validate=True):
+        """
+        return the interned Word for (name, pos, lang)
+        """
+        key = name, pos, lang
+        with self._words_lock:
+            word = self._words.get(key)
+        if self._instrumentation.enabled:
+            self._instrumentation.record('word.miss' if word is None else 'word.hit', 0.0, key)
+        if word is None:
+            word = Word(self, name, pos, lang=lang, validate=validate)
+            with self._words_lock:
+                word = self._words.setdefault(key, word)
         return word
 
     def lemma(self, name, lang='eng'):
@@ -204,7 +783,7 @@ class exWordNet(object):
         for s in wn.synsets(name, lang=lang):
             poss.append(s.pos())
         for pos in list(set(poss)):
-            word = Word(self, name, pos, lang=lang)
+            word = self._word(name, pos, lang=lang)
             words.append(word)
         return sorted(words)
 
@@ -236,9 +815,67 @@ class exWordNet(object):
 
         for pos_tag in pos_tags:
             for l in wn.all_lemma_names(pos=pos_tag, lang=lang):
-                word = Word(self, l, pos_tag, lang=lang)
+                word = self._word(l, pos_tag, lang=lang, validate=False)
                 yield word
 
+    ###############################
+    # Shared data
+    ###############################
+    def publish_shared(self, name=None, path=None, langs=()):
+        """
+        copy the loaded compiled vector stores, frequency tables and
+        normalized matrices into shared memory, or into the file path
+        the stores and tables of langs are loaded first (compiled stores only)
+        returns the SharedData, keep it open while other processes use it
+        and call unlink() at the end
+        """
+        for lang in langs:
+            for file_name in ['%s/synsets.txt' % self._root, '%s/topics.txt' % self._root,
+                              '%s/%s/lemmas.txt' % (self._root, lang), '%s/%s/words.txt' % (self._root, lang)]:
+                self._vector_store(file_name)
+            for topic in self.topics():
+                if os.path.exists(self._freq_file(lang, topic)):
+                    self._freq_table(lang, topic)
+
+        resources = []
+        prefix = self._root + '/'
+        for (kind, file_name), resource in self._pool.items():
+            if resource is None or not file_name.startswith(prefix):
+                continue
+            # file names are kept relative to root
+            rel = file_name[len(prefix):]
+            if kind == 'store':
+                keys = encode_keys(resource.keys())
+                arrays = dict(matrix=resource.matrix(), keys=keys, order=np.argsort(keys, kind='stable'))
+                resources.append((kind, rel, {}, arrays))
+            elif kind == 'freq':
+                keys = encode_keys(resource.keys())
+                arrays = dict(counts=resource.counts(), keys=keys, order=np.argsort(keys, kind='stable'))
+                resources.append((kind, rel, {'total': resource.total()}, arrays))
+            elif kind == 'normalized':
+                resources.append((kind, rel, {}, dict(matrix=resource)))
+        return SharedData.create(resources, name=name, path=path)
+
+    def attach_shared(self, name=None, path=None):
+        """
+        use the data published by publish_shared in another process
+        the arrays are read in place, read-only, until close() is called
+        """
+        shared = SharedData.attach(name=name, path=path)
+        for kind, rel, meta, arrays in shared.resources():
+            file_name = '%s/%s' % (self._root, rel)
+            if kind == 'store':
+                index = SharedIndex(arrays['keys'], arrays['order'])
+                self._pool.put((kind, file_name), SharedVectorStore(file_name, index, arrays['matrix']))
+            elif kind == 'freq':
+                index = SharedIndex(arrays['keys'], arrays['order'])
+                self._pool.put((kind, file_name), SharedFreqTable(index, arrays['counts'], meta['total']))
+            elif kind == 'normalized':
+                self._pool.put((kind, file_name), arrays['matrix'])
+        # closed together with the data files
+        self._pool.put(('shared', shared.name), shared)
+        return shared
+
     ###############################
     # Load vector
     ###############################
@@ -247,28 +884,170 @@ class exWordNet(object):
         extract vector for the object
         the object could be Word, Synset, Lemma
         """
+        file_name, key = self._vector_key(obj)
+        vector = self._lookup_vector(file_name, key)
+
+        if np.dot(vector, vector)==0:
+            raise exWordNetError('no vector for %r' % obj)
+
+        return vector
+
+    def vectors(self, objs):
+        """
+        extract vectors for many objects at once
+        returns (n, dim) matrix and a boolean mask of the objects found,
+        rows of objects without vector are zero instead of raising an error
+        """
+        objs = list(objs)
+        # group keys by the vector file they live in
+        by_file = {}
+        for i, obj in enumerate(objs):
+            file_name, key = self._vector_key(obj)
+            by_file.setdefault(file_name, ([], []))
+            by_file[file_name][0].append(i)
+            by_file[file_name][1].append(key)
+
+        matrix = None
+        for file_name, (positions, keys) in by_file.items():
+            vectors = self._key_vectors(file_name, keys)
+            if matrix is None:
+                matrix = np.zeros((len(objs), vectors.shape[1]))
+            matrix[positions] = vectors
+
+        if matrix is None:
+            # no objects, the vectors of the root all have the synset dimension
+            matrix = np.zeros((0, self._file_dim('%s/synsets.txt' % self._root)))
+        found = np.any(matrix != 0, axis=1)
+        return matrix, found
+
+    def _key_vectors(self, file_name, keys):
+        """
+        vectors for many keys of one vector file, zero rows for keys not found
+        """
+        store = self._vector_store(file_name)
+        if store is None:
+            return self._text_vectors(file_name, keys)
+        rows = store.indices(keys)
+        found = rows >= 0
+        vectors = np.zeros((len(keys), store.dim()))
+        vectors[found] = store.matrix()[rows[found]]
+        return vectors
+
+    def _text_vectors(self, file_name, keys):
+        """
+        look up many keys in the text vector file
+        a few keys are binary searched, otherwise the file is read in one pass
+        rows of keys not found are zero
+        """
+        if len(keys) <= self._SEARCH_LIMIT:
+            found = {}
+            for key in set(keys):
+                line = self._pool.search(file_name, key)
+                if line != None:
+                    found[key] = self._vector_from_line(line)
+        else:
+            found = self._scan_vectors(file_name, keys)
+
+        dim = len(next(iter(found.values()))) if found else self._file_dim(file_name)
+        vectors = np.zeros((len(keys), dim))
+        for j, key in enumerate(keys):
+            if key in found:
+                vectors[j] = found[key]
+        return vectors
+
+    def _scan_vectors(self, file_name, keys):
+        """
+        look up many keys in one pass over the sorted text vector file
+        returns a dict of the keys found
+        """
+        instrumentation = self._instrumentation
+        start = _clock() if instrumentation.enabled else None
+        wanted = sorted(set(keys))
+        found = {}
+        with self._pool.locked(file_name) as f:
+            f.seek(0)
+            i = 0
+            while i < len(wanted):
+                line = f.readline()
+                if line == '':
+                    break
+                key = line.split(' ', 1)[0]
+                # skip keys which are not in the file
+                while i < len(wanted) and wanted[i] < key:
+                    i += 1
+                if i < len(wanted) and wanted[i] == key:
+                    found[key] = self._vector_from_line(line)
+                    i += 1
+        if start is not None:
+            instrumentation.record('scan', _clock() - start, file_name)
+        return found
+
+    def _vector_key(self, obj):
+        """
+        find the vector file and the key for the object
+        """
         obj_name = type(obj).__name__.lower()
         if obj_name == 'synset':
-            _data_file = open('%s/synsets.txt' % self._root, 'r')
-            line = binary_search_file(_data_file, obj._name)
+            return '%s/synsets.txt' % self._root, obj._name
         elif obj_name == 'lemma':
             tup = self._root, obj._lang
-            _data_file = open('%s/%s/lemmas.txt' % tup, 'r')
+            file_name = '%s/%s/lemmas.txt' % tup
             tup = obj._synset._name, obj._name
-            line = binary_search_file(_data_file, '%s:%s' % tup)
+            return file_name, '%s:%s' % tup
         elif obj_name == 'word':
             tup = self._root, obj._lang
-            _data_file = open('%s/%s/words.txt' % tup, 'r')
-            line = binary_search_file(_data_file, obj._name)
+            return '%s/%s/words.txt' % tup, obj._name
         else:
             raise exWordNetError('%r is not WordNet Object' % obj)
 
-        vector = self._vector_from_line(line)
+    def _vector_store(self, file_name):
+        """
+        compiled store for the vector file, or None if it is not compiled
+        """
+        def load():
+            if is_compiled(file_name):
+                return VectorStore(file_name)
+            return None
+        return self._pool.resource(('store', file_name), load)
 
-        if sum(vector*vector)==0:
-            raise exWordNetError('no vector for %r' % obj)
+    def _lookup_vector(self, file_name, key):
+        """
+        look up the key in the compiled store, fall back to the text file
+        the returned vector is zero vector if the key is not found
+        """
+        store = self._vector_store(file_name)
+        if store is not None:
+            vector = store.get(key)
+            if vector is None:
+                return np.zeros(store.dim())
+            return vector
 
-        return vector
+        line = self._pool.search(file_name, key)
+        if line == None:
+            return np.zeros(self._file_dim(file_name))
+        return self._vector_from_line(line)
+
+    def _file_dim(self, file_name):
+        """
+        dimension of the vectors in the vector file, from the compiled store
+        or the first line of the text file, _DIM if there is neither
+        """
+        def load():
+            store = self._vector_store(file_name)
+            if store is not None:
+                return store.dim()
+            if os.path.exists(file_name):
+                with open(file_name, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        tokens = line.split()
+                        if len(tokens) == 0:
+                            continue
+                        # word2vec style header "<count> <dim>"
+                        if len(tokens) == 2 and tokens[0].isdigit() and tokens[1].isdigit():
+                            return int(tokens[1])
+                        return len(tokens) - 1
+            return self._DIM
+        return self._pool.resource(('dim', file_name), load)
 
     def _vector_from_line(self, line):
         """
@@ -277,9 +1056,12 @@ class exWordNet(object):
         the returned vector would be zero vector
         """
         if line == None:
-            return np.zeros(300)
+            return np.zeros(self._DIM)
         else:
+            start = _clock() if self._instrumentation.enabled else None
             vector = np.array(list(map(float, line.strip().split()[1:])))
+            if start is not None:
+                self._instrumentation.record('parse', _clock() - start)
             return vector
 
     ###############################
@@ -291,20 +1073,230 @@ class exWordNet(object):
         if the object is not found in the file,
         the returned frequency would be zero
         """
-        # if wrong topic is entered, then raise error
-        if topic not in self._TOPICS:
-            raise exWordNetError('%s is not registered as a topic' % topic)
+        self._check_topic(topic)
 
-        _data_file = open('%s/%s/freq/freq.%s.txt' % (self._root, lemma._lang, topic), 'r')
-        line = _data_file.readline()
-        total = int(line.split(' ')[0])
-        assert total > 0
+        table = self._freq_table(lemma._lang, topic)
         tup = lemma._synset._name, lemma._name
-        line = binary_search_file(_data_file, '%s:%s' % tup)
-        if line == None:
-            return 0
+        return table.freq('%s:%s' % tup)
+
+    def lemma_freqs(self, lemmas, topic):
+        """
+        frequencies of many lemmas in specific topic at once
+        returns an array in the order of lemmas, zero for lemmas not found
+        """
+        self._check_topic(topic)
+
+        lemmas = list(lemmas)
+        freqs = np.zeros(len(lemmas))
+        # lemmas of different languages come from different freq files
+        by_lang = {}
+        for i, l in enumerate(lemmas):
+            by_lang.setdefault(l._lang, []).append(i)
+        for lang, positions in by_lang.items():
+            table = self._freq_table(lang, topic)
+            keys = ['%s:%s' % (lemmas[i]._synset._name, lemmas[i]._name) for i in positions]
+            freqs[positions] = table.freqs(keys)
+        return freqs
+
+    def _freq_table(self, lang, topic):
+        """
+        frequency table of the topic for the language, loaded once
+        """
+        file_name = self._freq_file(lang, topic)
+        def load():
+            # topics registered for another language have no freq file
+            if not os.path.exists(file_name):
+                raise exWordNetError('topic %s is not registered for %s' % (topic, lang))
+            return _FreqTable(file_name)
+        return self._pool.resource(('freq', file_name), load)
+
+    def _freq_file(self, lang, topic):
+        return '%s/%s/freq/freq.%s.txt' % (self._root, lang, topic)
+
+    def ambiguities(self, words, topic='general'):
+        """
+        ambiguity of many words at once, see Word.ambiguity
+        frequencies of all lemmas are looked up in one batch,
+        words without lemmas or whose frequencies are all 0 get nan
+        """
+        lemmas = []
+        offsets = [0]
+        for word in words:
+            lemmas.extend(word.lemmas())
+            offsets.append(len(lemmas))
+        offsets = np.array(offsets)
+        ambiguities = np.full(len(offsets)-1, np.nan)
+        if len(lemmas) == 0:
+            return ambiguities
+
+        f = self.lemma_freqs(lemmas, topic)
+        # reduce over the lemmas of each word, skipping words without lemmas
+        nonempty = offsets[1:] > offsets[:-1]
+        starts = offsets[:-1][nonempty]
+        maxes = np.maximum.reduceat(f, starts)
+        counts = (offsets[1:] - offsets[:-1])[nonempty]
+        scale = np.repeat(maxes, counts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = _ambiguity_weight(f/scale, Word._DELTA)
+        sums = np.add.reduceat(weights, starts)
+        sums[maxes == 0] = np.nan
+        ambiguities[nonempty] = sums
+        return ambiguities
+
+    ###############################
+    # Topic conditioned word vectors
+    ###############################
+    def build_topic_word_vectors(self, lang='eng', topics=None, chunk_size=1000):
+        """
+        compute the topic vector of every word of the language for each topic
+        (see Word.vector) and save them as a compiled store
+        <root>/<lang>/topic_words.<topic>.{keys,npy}, keyed by 'name.pos'
+        a store older than its freq file or the lemma vectors is not used
+        until it is built again
+        by default every topic with a freq file for the language is built
+        """
+        if topics is None:
+            topics = [t for t in self.topics() if os.path.exists(self._freq_file(lang, t))]
+        words = list(self.all_words(lang=lang))
+        keys = ['%s.%s' % (w._name, w._pos) for w in words]
+        for topic in topics:
+            file_name = self._topic_word_file(lang, topic)
+            matrix = None
+            try:
+                for start in range(0, len(words), chunk_size):
+                    vectors = self._topic_word_matrix(words[start:start+chunk_size], topic)
+                    if matrix is None:
+                        matrix = create_store(file_name, keys, vectors.shape[1])
+                    matrix[start:start+len(vectors)] = vectors
+                # the old store is only replaced once every row is written
+                if matrix is not None:
+                    finish_store(file_name, matrix)
+            finally:
+                matrix = None
+                discard_store(file_name)
+            self._pool.discard(('store', file_name))
+
+    def topic_relatedness_all(self, topic, pos=None, lang='eng'):
+        """
+        topic relatedness of every word of the language (see Word.topic_relatedness)
+        returns an array of word keys 'name.pos' and an array of scores,
+        words without topic vector are left out
+        """
+        keys = []
+        scores = []
+        for chunk_keys, chunk_scores in self.iter_topic_relatedness(topic, pos=pos, lang=lang):
+            keys.append(chunk_keys)
+            scores.append(chunk_scores)
+        if len(keys) == 0:
+            return np.array([], dtype=str), np.array([])
+        return np.concatenate(keys), np.concatenate(scores)
+
+    def iter_topic_relatedness(self, topic, pos=None, lang='eng', chunk_size=10000):
+        """
+        same as topic_relatedness_all but yields (keys, scores) chunk by chunk
+        so that memory stays bounded for large languages
+        """
+        tv = self.topic_vector(topic)
+        tv = tv/np.sqrt(np.dot(tv, tv))
+
+        store = self._topic_word_store(lang, topic)
+        if store is not None:
+            # one matrix-vector product per chunk of the precomputed matrix
+            keys = np.array(store.keys())
+            if pos is not None:
+                rows = np.flatnonzero([k.rsplit('.', 1)[1] == pos for k in store.keys()])
+            else:
+                rows = np.arange(len(keys))
+            matrix = store.matrix()
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start+chunk_size]
+                yield self._topic_relatedness_chunk(keys[chunk], matrix[chunk], tv)
         else:
-            return int(line.strip().split(' ')[1])/total
+            words = []
+            for word in self.all_words(pos=pos, lang=lang):
+                words.append(word)
+                if len(words) == chunk_size:
+                    yield self._topic_relatedness_chunk(self._word_keys(words), self._topic_word_matrix(words, topic), tv)
+                    words = []
+            if len(words) > 0:
+                yield self._topic_relatedness_chunk(self._word_keys(words), self._topic_word_matrix(words, topic), tv)
+
+    def _word_keys(self, words):
+        return np.array(['%s.%s' % (w._name, w._pos) for w in words])
+
+    def _topic_relatedness_chunk(self, keys, matrix, tv):
+        """
+        cosine of every row with the unit length topic vector, zero rows dropped
+        """
+        matrix = np.asarray(matrix)
+        norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+        found = norms > 0
+        return keys[found], np.dot(matrix[found], tv)/norms[found]
+
+    def _topic_word_file(self, lang, topic):
+        return '%s/%s/topic_words.%s.txt' % (self._root, lang, topic)
+
+    def _topic_word_sources(self, lang, topic):
+        """
+        files the topic word store is computed from
+        the compiled lemma matrix counts only when there is no lemmas.txt,
+        compiling lemmas.txt does not change the vectors
+        """
+        lemmas_file = '%s/%s/lemmas.txt' % (self._root, lang)
+        if not os.path.exists(lemmas_file):
+            lemmas_file = compiled_paths(lemmas_file)[1]
+        return [self._freq_file(lang, topic), lemmas_file]
+
+    def _topic_word_store(self, lang, topic):
+        """
+        store built by build_topic_word_vectors, None if it is not built or
+        older than the freq file or the lemma vectors it was computed from
+        """
+        file_name = self._topic_word_file(lang, topic)
+        def load():
+            if not is_compiled(file_name):
+                return None
+            built = os.path.getmtime(compiled_paths(file_name)[1])
+            for source in self._topic_word_sources(lang, topic):
+                if os.path.exists(source) and os.path.getmtime(source) > built:
+                    return None
+            return VectorStore(file_name)
+        return self._pool.resource(('store', file_name), load)
+
+    def _topic_word_vector(self, word, topic):
+        """
+        precomputed topic vector of the word, None if it is not built or out of date
+        """
+        self._check_topic(topic)
+        store = self._topic_word_store(word._lang, topic)
+        if store is None:
+            return None
+        return store.get('%s.%s' % (word._name, word._pos))
+
+    def _topic_word_matrix(self, words, topic):
+        """
+        frequency weighted sum of the lemma vectors for each word
+        lemmas without vector do not contribute
+        """
+        lemmas = []
+        offsets = [0]
+        for word in words:
+            lemmas.extend(word.lemmas())
+            offsets.append(len(lemmas))
+        if len(lemmas) == 0:
+            if len(words) == 0:
+                return np.zeros((0, self._file_dim('%s/synsets.txt' % self._root)))
+            return np.zeros((len(words), self._file_dim('%s/%s/lemmas.txt' % (self._root, words[0]._lang))))
+
+        freqs = self.lemma_freqs(lemmas, topic)
+        vectors, found = self.vectors(lemmas)
+        weighted = freqs[:, np.newaxis]*vectors
+
+        offsets = np.array(offsets)
+        nonempty = offsets[1:] > offsets[:-1]
+        matrix = np.zeros((len(words), vectors.shape[1]))
+        matrix[nonempty] = np.add.reduceat(weighted, offsets[:-1][nonempty], axis=0)
+        return matrix
 
     ###############################
     # Load topic vector
@@ -313,12 +1305,16 @@ class exWordNet(object):
         """
         extract topic vector calculated as a frequency weighted lemma vector
         """
-        if topic not in self._TOPICS:
-            raise exWordNetError('%s is not registered as a topic' % topic)
+        self._check_topic(topic)
 
-        _data_file = open('%s/topics.txt' % self._root, 'r')
+        store = self._vector_store('%s/topics.txt' % self._root)
+        if store is not None:
+            vector = store.get(topic)
+            if vector is None:
+                raise exWordNetError('no topic vector for %s' % topic)
+            return vector
 
-        line = binary_search_file(_data_file, topic)
+        line = self._pool.search('%s/topics.txt' % self._root, topic)
         if line == None:
             raise exWordNetError('no topic vector for %s' % topic)
         else:
@@ -335,6 +1331,177 @@ class exWordNet(object):
     def _relatedness(self, vec_in, vec_out):
         return _relatedness(vec_in, vec_out)
 
+    def relatedness_matrix(self, objs_a, objs_b):
+        """
+        cosine similarity between every object of objs_a and every object of objs_b
+        entries for objects without vector are nan
+        """
+        a, found_a = self.vectors(objs_a)
+        b, found_b = self.vectors(objs_b)
+        matrix = np.dot(_normalize_rows(a), _normalize_rows(b).T)
+        matrix[~found_a, :] = np.nan
+        matrix[:, ~found_b] = np.nan
+        return matrix
+
+    def most_similar(self, obj, k=10, kind='synset', lang='eng', approximate=False, nprobe=8):
+        """
+        find the k most similar synsets, lemmas or words to the object
+        searches the whole compiled vector store of the kind,
+        or only nprobe lists of the ann index if approximate is True
+        (build it first with build_ann_index, more lists give higher recall)
+        returns a list of (key, relatedness) in descending order
+        """
+        file_name = self._kind_file(kind, lang)
+        store = self._vector_store(file_name)
+        if store is None:
+            raise exWordNetError('vectors in %s are not compiled' % file_name)
+        matrix = self._normalized_matrix(file_name)
+
+        vector = self.vector(obj)
+        query = vector/np.sqrt(np.dot(vector, vector))
+        # the object itself is not a neighbour
+        query_file, query_key = self._vector_key(obj)
+        exclude = -1
+        if query_file == file_name:
+            exclude = store.index(query_key)
+
+        if approximate:
+            index = self._ann_index(file_name)
+            if index is None:
+                raise exWordNetError('no ann index for %s, build it with build_ann_index' % file_name)
+            rows, scores = index.search(matrix, query, k+1, nprobe)
+        else:
+            scores = np.dot(matrix, query)
+            n = min(k+1, len(scores))
+            if n <= 0:
+                return []
+            rows = np.argpartition(-scores, n-1)[:n]
+            rows = rows[np.argsort(-scores[rows])]
+            scores = scores[rows]
+
+        keys = store.keys()
+        similar = [(keys[i], float(score)) for i, score in zip(rows, scores) if i != exclude]
+        return similar[:k]
+
+    def build_ann_index(self, kind='synset', lang='eng', nlist=None, n_iter=10):
+        """
+        build the ann index used by most_similar(..., approximate=True)
+        and save it next to the vector file
+        """
+        file_name = self._kind_file(kind, lang)
+        if self._vector_store(file_name) is None:
+            raise exWordNetError('vectors in %s are not compiled' % file_name)
+        index = IVFIndex.build(self._normalized_matrix(file_name), nlist=nlist, n_iter=n_iter)
+        index.save(index_path(file_name))
+        self._pool.discard(('ann', file_name))
+        return index
+
+    def _ann_index(self, file_name):
+        """
+        ann index for the vector file, or None if it is not built
+        """
+        def load():
+            if is_indexed(file_name):
+                return IVFIndex.load(index_path(file_name))
+            return None
+        return self._pool.resource(('ann', file_name), load)
+
+    def _kind_file(self, kind, lang='eng'):
+        """
+        vector file of synsets, lemmas or words
+        """
+        if kind == 'synset':
+            return '%s/synsets.txt' % self._root
+        elif kind == 'lemma':
+            return '%s/%s/lemmas.txt' % (self._root, lang)
+        elif kind == 'word':
+            return '%s/%s/words.txt' % (self._root, lang)
+        else:
+            raise exWordNetError('%s is not a kind of vector, try synset, lemma or word' % kind)
+
+    def _normalized_matrix(self, file_name):
+        """
+        unit length rows of the compiled store, computed once
+        """
+        def load():
+            return _normalize_rows(np.asarray(self._vector_store(file_name).matrix()))
+        return self._pool.resource(('normalized', file_name), load)
+
+    ###############################
+    # Association
+    ###############################
+    def associations(self, word, others, topic=None, index=False):
+        """
+        association of word with every word in others, see Word.association
+        the vector and the ancestors of word are computed only once,
+        entries for words which are not connected or have no vector are None
+        """
+        try:
+            v = word.vector(topic=topic)
+        except exWordNetError:
+            return [None for _ in others]
+        ancestors = self._ancestor_distances(word.synsets())
+
+        results = []
+        for other in others:
+            try:
+                rel = _relatedness(v, other.vector(topic=topic))
+            except exWordNetError:
+                results.append(None)
+                continue
+            sp = self._closest_common_ancestor(ancestors, self._ancestor_distances(other.synsets()))
+            if sp == None:
+                results.append(None)
+            elif index:
+                results.append(rel*np.log(1+sp/word._k))
+            else:
+                results.append((rel, sp))
+        return results
+
+    def _synset_hypernym_distances(self, synset):
+        """
+        distance from the synset to each of its hypernyms (itself included)
+        cached with LRU eviction
+        """
+        return self._hypernym_distances.get(synset, lambda: synset._shortest_hypernym_paths(False))
+
+    def _ancestor_distances(self, synsets):
+        """
+        minimum distance from any of the synsets to each common hypernym
+        """
+        distances = {}
+        for synset in synsets:
+            for ancestor, d in self._synset_hypernym_distances(synset).items():
+                if d < distances.get(ancestor, d+1):
+                    distances[ancestor] = d
+        return distances
+
+    def _closest_common_ancestor(self, distances1, distances2):
+        """
+        length of the shortest path through a common hypernym, None if there is none
+        """
+        if len(distances1) > len(distances2):
+            distances1, distances2 = distances2, distances1
+        sp = None
+        for ancestor, d1 in distances1.items():
+            d2 = distances2.get(ancestor)
+            if d2 != None and (sp == None or d1+d2 < sp):
+                sp = d1+d2
+        return sp
+
+    def _shortest_path_distance(self, synsets1, synsets2):
+        """
+        minimum of Synset.shortest_path_distance over all pairs of synsets
+        computed in one pass over the merged hypernym distances
+        None if no pair is connected
+        """
+        start = _clock() if self._instrumentation.enabled else None
+        sp = self._closest_common_ancestor(self._ancestor_distances(synsets1),
+                                           self._ancestor_distances(synsets2))
+        if start is not None:
+            self._instrumentation.record('shortest_path', _clock() - start)
+        return sp
+
     ###############################
     # Multilingual definitions
     ###############################
@@ -346,14 +1513,23 @@ class exWordNet(object):
         if lang == 'eng':
             return synset.definition()
         else:
-            try:
-                _data_file = open('%s/%s.definition.txt' % (self._root, lang) , 'r')
-                key = '{:08d}-{}'.format(synset.offset(), synset.pos())
-                line = search_line(_data_file, key)
-                if line == None:
-                    return 'None'
-                # raise exWordNetError('no definition for %r' % synset)
-                else:
-                    return line.strip().split('|')[-1]
-            except:
-                raise exWordNetError('currently %s is not supported' % lang)
+            definitions = self._definitions(lang)
+            key = '{:08d}-{}'.format(synset.offset(), synset.pos())
+            # raise exWordNetError('no definition for %r' % synset)
+            return definitions.get(key, 'None')
+
+    def definitions(self, synsets, lang='eng'):
+        """
+        definitions of many synsets at once, see definition
+        """
+        return [self.definition(synset, lang=lang) for synset in synsets]
+
+    def _definitions(self, lang):
+        """
+        definitions of the language keyed by '{offset:08d}-{pos}', loaded once
+        """
+        file_name = '%s/%s.definition.txt' % (self._root, lang)
+        try:
+            return self._pool.resource(('definition', file_name), lambda: _load_definitions(file_name))
+        except (IOError, OSError):
+            raise exWordNetError('currently %s is not supported' % lang)
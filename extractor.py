@@ -0,0 +1,403 @@
+# Shared command line and process pool runner for the WordNet extractors
+#
+# python [b|f|fg]extractor.py <root> <lang> [<lang> ...] [--jobs N] [--quiet|--verbose]
+# with --jobs N > 1 the languages, and afterwards the relations of every
+# language split by part of speech, are extracted in N worker processes
+# indexes are always assigned by the words stage of one language in one
+# process, so the output files are identical to the serial run
+# after the text files, the lexeme and relation matrices are also saved as
+# CSR .npz files (see export_npz) so AutoExtend can load them directly
+# every run records the hashes of its inputs in <lang>/manifest.json, a rerun
+# only redoes the work needed for the inputs that changed (see check_inputs),
+# delete the manifest to force a full extraction
+import argparse
+import hashlib
+import inspect
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+# buffer size of the output files
+WRITE_BUFFER = 1 << 20
+
+# exWordNet shared by the extractors of a process, see wordnet()
+_wordnet = None
+
+def wordnet():
+    """
+    exWordNet used to walk WordNet, created on first use so that importing
+    an extractor (or unpickling one in a worker) does not load WordNet
+    """
+    global _wordnet
+    if _wordnet is None:
+        from exWordNet import exWordNet
+        _wordnet = exWordNet('./')
+    return _wordnet
+
+def open_output(filename, append=False):
+    """
+    buffered utf-8 output file, '\n' is written as is
+    """
+    mode = 'a' if append else 'w'
+    return io.open(filename, mode, encoding='utf-8', newline='\n', buffering=WRITE_BUFFER)
+
+@contextmanager
+def timed(timings, stage):
+    """
+    add the time spent in the block to timings[stage]
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.time() - start
+
+def print_timings(lang, timings):
+    print("TIMING: %s" % lang)
+    for stage, seconds in timings.items():
+        print("  %s: %.2fs" % (stage, seconds))
+
+class Progress(object):
+    """
+    report the items processed in a stage
+    mode 'verbose' prints every item, 'progress' keeps one updating line
+    on stderr, 'quiet' prints nothing
+    """
+    def __init__(self, label, mode='progress', every=1000):
+        self.label = label
+        self.mode = mode
+        self.every = every
+        self.count = 0
+        self.start = time.time()
+
+    def update(self, item=None):
+        self.count += 1
+        if self.mode == 'verbose':
+            print(item)
+        elif self.mode == 'progress' and self.count % self.every == 0:
+            self._write()
+
+    def close(self):
+        if self.mode == 'progress':
+            self._write()
+            sys.stderr.write('\n')
+
+    def _write(self):
+        elapsed = max(time.time() - self.start, 1e-6)
+        sys.stderr.write('\r%s: %d (%.0f/s)' % (self.label, self.count, self.count/elapsed))
+        sys.stderr.flush()
+
+class VectorLineIndex(object):
+    """
+    key -> byte offset of the line in a text vector file
+    only the offsets are kept in memory, the vector text of a key is read
+    from the file when it is written out, as ' '.join(line.strip().split(' ')[1:])
+    """
+    def __init__(self, file_name):
+        self._file = open(file_name, 'rb')
+        self._offsets = {}
+        offset = 0
+        for line in self._file:
+            name = line.decode('utf-8').strip().split(' ', 1)[0]
+            self._offsets[name] = offset
+            offset += len(line)
+
+    def __contains__(self, key):
+        return key in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, key):
+        self._file.seek(self._offsets[key])
+        tokens = self._file.readline().decode('utf-8').strip().split(' ', 1)
+        if len(tokens) < 2:
+            return ''
+        return tokens[1]
+
+    def keys(self):
+        return self._offsets.keys()
+
+    def close(self):
+        self._file.close()
+
+def load_vector_line(file_name):
+    return VectorLineIndex(file_name)
+
+def _read_ints(filename, columns):
+    # whitespace separated integers, one row per line
+    return np.fromfile(filename, dtype=np.int64, sep=' ').reshape(-1, columns)
+
+def _read_keys(filename):
+    # first token of every line, line i holds index i+1
+    with io.open(filename, 'r', encoding='utf-8') as f:
+        return np.array([line.split(' ', 1)[0].rstrip('\n') for line in f], dtype=str)
+
+def _csr(rows, cols, values, shape):
+    """
+    arrays of a CSR matrix in the layout of scipy.sparse.save_npz,
+    duplicate entries are summed as sparse() does in AutoExtend
+    """
+    order = np.lexsort((cols, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    if len(rows) > 0:
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        starts = np.flatnonzero(first)
+        rows, cols, values = rows[starts], cols[starts], np.add.reduceat(values, starts)
+    indptr = np.zeros(shape[0]+1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+    return dict(format=np.array(b'csr'), shape=np.array(shape), data=values,
+                indices=cols.astype(np.int32), indptr=indptr.astype(np.int32))
+
+def export_npz(extractor):
+    """
+    save the lexeme and relation matrices of the extracted text files as
+    compressed CSR files (scipy.sparse.load_npz reads them) in the same folder
+      iota.npz       lexemes, (vectors x targets), 1 per lexeme as in AutoExtend
+      theta.npz      transpose of iota
+      counts.npz     lexeme counts, if lexemes.txt has a count column
+      relations.npz  relation files stacked in relation_files() order,
+                     one row per pair with +1 at the source and -1 at the target
+      index.npz      keys of the vector and target indexes, relation names
+                     and the first row of each relation in relations.npz
+    rows and columns are 0-based, index i in the text files is row i-1
+    """
+    vector_file, target_file = extractor.matrix_files()
+    vector_keys = _read_keys(vector_file)
+    target_keys = _read_keys(target_file)
+    shape = (len(vector_keys), len(target_keys))
+
+    lexemes_file = extractor.folder + "/lexemes.txt"
+    with io.open(lexemes_file, 'r') as f:
+        columns = len(f.readline().split())
+    lexemes = _read_ints(lexemes_file, columns or 2)
+    rows, cols = lexemes[:, 0] - 1, lexemes[:, 1] - 1
+    ones = np.ones(len(lexemes))
+    np.savez_compressed(extractor.folder + "/iota.npz", **_csr(rows, cols, ones, shape))
+    np.savez_compressed(extractor.folder + "/theta.npz", **_csr(cols, rows, ones, shape[::-1]))
+    if columns == 3:
+        counts = lexemes[:, 2].astype(np.float64)
+        np.savez_compressed(extractor.folder + "/counts.npz", **_csr(rows, cols, counts, shape))
+
+    pairs = []
+    names = []
+    offsets = [0]
+    for filename, relation_symbol in extractor.relation_files():
+        pairs.append(_read_ints(filename, 2))
+        names.append(extractor.pointer_map[relation_symbol])
+        offsets.append(offsets[-1] + len(pairs[-1]))
+    pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+    n = len(pairs)
+    rows = np.concatenate([np.arange(n), np.arange(n)])
+    cols = np.concatenate([pairs[:, 0], pairs[:, 1]]) - 1
+    values = np.concatenate([np.ones(n), -np.ones(n)])
+    np.savez_compressed(extractor.folder + "/relations.npz", **_csr(rows, cols, values, (n, shape[1])))
+
+    np.savez_compressed(extractor.folder + "/index.npz", vectors=vector_keys, targets=target_keys,
+                        relation_names=np.array(names, dtype=str), relation_offsets=np.array(offsets))
+
+###############################
+# incremental extraction
+###############################
+def manifest_path(extractor):
+    return extractor.folder + "/manifest.json"
+
+def _hash_vectors(file_name, prefix_size=None):
+    """
+    sha1 of the vector file and of its keys, in one pass over the lines
+    if prefix_size falls on a line end, also the sha1 of the first prefix_size
+    bytes and the keys of the lines after them
+    """
+    content = hashlib.sha1()
+    keys = hashlib.sha1()
+    prefix = None
+    added = set()
+    size = 0
+    with open(file_name, 'rb') as f:
+        for line in f:
+            if size == prefix_size:
+                prefix = content.hexdigest()
+            key = line.strip().split(b' ', 1)[0]
+            if prefix is not None:
+                added.add(key.decode('utf-8'))
+            content.update(line)
+            keys.update(key + b'\n')
+            size += len(line)
+    if size == prefix_size:
+        prefix = content.hexdigest()
+    inputs = dict(file=os.path.basename(file_name), size=size,
+                  sha1=content.hexdigest(), keys_sha1=keys.hexdigest())
+    return inputs, prefix, added
+
+def _outputs(extractor):
+    files = list(extractor.matrix_files())
+    files.append(extractor.folder + "/lexemes.txt")
+    files.extend(filename for filename, relation_symbol in extractor.relation_files())
+    files.append(extractor.folder + "/index.npz")
+    return files
+
+def read_manifest(extractor):
+    path = manifest_path(extractor)
+    if not os.path.exists(path):
+        return None
+    with io.open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_manifest(extractor):
+    path = manifest_path(extractor)
+    with io.open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(extractor.inputs, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def check_inputs(extractor):
+    """
+    compare the inputs with the manifest of the previous run and set
+    extractor.plan to what has to be done
+      None       nothing changed
+      'vectors'  the same keys with other vectors, only the vectors are rewritten
+      'append'   vectors were only appended to the file, the new entries are
+                 appended to the index files and the relations
+      'full'     the first run, or WordNet, the language or old vectors changed
+    """
+    previous = read_manifest(extractor)
+    prefix_size = previous['vectors']['size'] if previous else None
+    vectors, prefix, added = _hash_vectors(extractor.file_name, prefix_size)
+    # the module, as fextractor and fgextractor share the class name
+    module = os.path.splitext(os.path.basename(inspect.getfile(type(extractor))))[0]
+    extractor.inputs = dict(extractor=module, lang=extractor.lang,
+                            wordnet=str(extractor.wordnet_version()), vectors=vectors)
+
+    extractor.plan = 'full'
+    if previous is None or not all(os.path.exists(f) for f in _outputs(extractor)):
+        return extractor.plan
+    if any(previous.get(k) != extractor.inputs[k] for k in ('extractor', 'lang', 'wordnet')):
+        return extractor.plan
+
+    if previous['vectors']['sha1'] == vectors['sha1']:
+        extractor.plan = None
+    elif previous['vectors']['keys_sha1'] == vectors['keys_sha1']:
+        extractor.plan = 'vectors'
+    elif prefix == previous['vectors']['sha1']:
+        # a key added again overrides the vector already written for it
+        vector_file = extractor.matrix_files()[0]
+        if not added.intersection(_read_keys(vector_file)):
+            extractor.plan = 'append'
+    return extractor.plan
+
+def previous_run(extractor):
+    """
+    vector side index of the previous run, which the new entries continue,
+    and the target indexes that already had lexemes
+    both are empty unless the plan is 'append'
+    """
+    index = {}
+    covered = set()
+    if extractor.plan != 'append':
+        return index, covered
+    vector_file, target_file = extractor.matrix_files()
+    for i, key in enumerate(_read_keys(vector_file)):
+        index[key] = i+1
+    with io.open(target_file, 'r', encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            if len(line.split()) > 1:
+                covered.add(i+1)
+    return index, covered
+
+def rewrite_vectors(extractor):
+    """
+    write the vector side file again with the new vectors, keeping the order
+    """
+    vector_file = extractor.matrix_files()[0]
+    model = load_vector_line(extractor.file_name)
+    keys = _read_keys(vector_file)
+    with open_output(vector_file) as f:
+        for key in keys:
+            f.write('%s %s\n' % (key, model[key]))
+    model.close()
+
+def parse_args(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('root', help='root of the data folder')
+    parser.add_argument('langs', nargs='+', help='languages to extract, e.g. eng jpn')
+    parser.add_argument('--jobs', type=int, default=1, help='number of worker processes')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--quiet', dest='mode', action='store_const', const='quiet', help='no progress output')
+    group.add_argument('--verbose', dest='mode', action='store_const', const='verbose', help='print every word')
+    parser.set_defaults(mode='progress')
+    return parser.parse_args()
+
+def _extract_words(extractor):
+    extractor.extractWords()
+    return extractor.WordIndex, extractor.SynsetIndex, extractor.covered, extractor.timings
+
+def _part(filename, pos):
+    return '%s.%s.part' % (filename, pos)
+
+def _extract_relations(extractor, pos):
+    with timed(extractor.timings, 'relations'):
+        extractor.extractRelations(pos_list=[pos], suffix=_part('', pos))
+    return extractor.timings['relations']
+
+def _merge_relations(extractor):
+    # parts are concatenated in the order the serial run walks the pos
+    mode = 'ab' if extractor.plan == 'append' else 'wb'
+    for filename, relation_symbol in extractor.relation_files():
+        with open(filename, mode) as f:
+            for pos in extractor.pos_list:
+                with open(_part(filename, pos), 'rb') as part:
+                    shutil.copyfileobj(part, f)
+                os.remove(_part(filename, pos))
+
+def run(extractor_class, root, langs, jobs=1, mode='progress'):
+    """
+    run the extractor for every language, serially or in jobs processes
+    the timing of the relations stage is summed over the workers
+    """
+    extractors = [extractor_class(root, lang, mode=mode) for lang in langs]
+    if jobs <= 1:
+        for extractor in extractors:
+            extractor.main()
+        return
+
+    pending = []
+    for extractor in extractors:
+        check_inputs(extractor)
+        if extractor.plan is None:
+            print("UP TO DATE: " + extractor.folder)
+        elif extractor.plan == 'vectors':
+            with timed(extractor.timings, 'rewrite vectors'):
+                rewrite_vectors(extractor)
+            write_manifest(extractor)
+            print_timings(extractor.lang, extractor.timings)
+        else:
+            pending.append(extractor)
+    extractors = pending
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # words and synsets first, they assign the indexes used by relations
+        futures = [executor.submit(_extract_words, e) for e in extractors]
+        for extractor, future in zip(extractors, futures):
+            extractor.WordIndex, extractor.SynsetIndex, extractor.covered, extractor.timings = future.result()
+
+        futures = []
+        for extractor in extractors:
+            for pos in extractor.pos_list:
+                futures.append((extractor, executor.submit(_extract_relations, extractor, pos)))
+        for extractor, future in futures:
+            extractor.timings['relations'] = extractor.timings.get('relations', 0) + future.result()
+    for extractor in extractors:
+        with timed(extractor.timings, 'merge relations'):
+            _merge_relations(extractor)
+        with timed(extractor.timings, 'export npz'):
+            export_npz(extractor)
+        write_manifest(extractor)
+        print_timings(extractor.lang, extractor.timings)
+    print("DONE")
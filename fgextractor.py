@@ -1,29 +1,14 @@
 # Python Version of WordNetExtractor.java
 import os
-import sys
-#exWordNet
-from exWordNet import exWordNet
-
-import codecs
+from extractor import (Progress, check_inputs, export_npz, load_vector_line, open_output, parse_args,
+                       previous_run, print_timings, rewrite_vectors, run, timed, wordnet, write_manifest)
 
 class ExtractorError(Exception):
     """An exception class for wordnet-related errors."""
 
-wn = exWordNet('./')
-
-def load_vector_line(file_name):
-    model = {}
-    f = open(file_name, 'r')
-    for line in f.readlines():
-        name = line.strip().split(' ')[0]
-        vector_line = line.strip().split(' ')[1:]
-        vector_line = ' '.join(vector_line)
-        model[name] = vector_line
-    return model
-
 class ForwardWordNetExtractor:
-    def __init__(self, root, lang):
-        if lang in wn.langs():
+    def __init__(self, root, lang, mode='progress'):
+        if lang in wordnet().langs():
             self.lang = lang
         else:
             raise ExtractorError("language: '%s' is not supported, try another language" % lang)
@@ -39,33 +24,79 @@ class ForwardWordNetExtractor:
         #initialize
         self.WordIndex = {}
         self.SynsetIndex = {}
+        # objects walked by extractWordsAndSynsets, reused for the relations
+        self.synsets = {}
         self.pos_list = ['a', 'r', 'n', 'v']
+        # 'progress', 'quiet' or 'verbose', see extractor.Progress
+        self.mode = mode
+        # seconds spent in each stage
+        self.timings = {}
+        # set by extractor.check_inputs, see there
+        self.plan = 'full'
+        # target indexes that already had lexemes before an 'append' run
+        self.covered = set()
         self.pointer_map = {"@":"hypernym", "&":"similar", "$":"verbGroup", "!":"antonym"}
 
     def main(self):
-        # Load vector line
-        self.model = load_vector_line(self.file_name)
-        ver = wn.get_version()
+        check_inputs(self)
+        if self.plan is None:
+            print("UP TO DATE: " + self.folder)
+            return
+        if self.plan == 'vectors':
+            with timed(self.timings, 'rewrite vectors'):
+                rewrite_vectors(self)
+        else:
+            self.extractWords()
+            with timed(self.timings, 'relations'):
+                self.extractRelations()
+            with timed(self.timings, 'export npz'):
+                export_npz(self)
+        write_manifest(self)
+
+        print_timings(self.lang, self.timings)
+        print("DONE")
+
+    def extractWords(self):
+        # index the vector lines, the vectors are read when they are written
+        with timed(self.timings, 'load vectors'):
+            self.model = load_vector_line(self.file_name)
+        ver = wordnet().get_version()
         print("RESOURCE: WN " + str(ver) + "\n")
         print("LANGUAGE: "+self.lang+"\n")
         print("VECTORS: " + self.file_name + "\n")
         print("TARGET: " + self.folder + "\n")
-        self.extractWordsAndSynsets(self.folder + "/words.txt",self.folder + "/synsets.txt",self.folder + "/lexemes.txt")
-        self.extractWordRelations(self.folder + "/hypernym.txt", '@')
-        self.extractWordRelations(self.folder + "/similar.txt",  '&')
-        self.extractWordRelations(self.folder + "/verbGroup.txt",  '$')
-        self.extractWordRelations(self.folder + "/antonym.txt",  '!')
-
-        print("DONE")
-
+        print("PLAN: " + self.plan + "\n")
+        # in an 'append' run the new entries continue the previous indexes
+        self.WordIndex, self.covered = previous_run(self)
+        self.appendFrom = len(self.WordIndex)
+        with timed(self.timings, 'words and synsets'):
+            self.extractWordsAndSynsets(self.folder + "/words.txt",self.folder + "/synsets.txt",self.folder + "/lexemes.txt")
+        self.model.close()
+
+    def wordnet_version(self):
+        return wordnet().get_version()
+
+    def relation_files(self):
+        return [
+            (self.folder + "/hypernym.txt", '@'),
+            (self.folder + "/similar.txt", '&'),
+            (self.folder + "/verbGroup.txt", '$'),
+            (self.folder + "/antonym.txt", '!'),
+        ]
+
+    def matrix_files(self):
+        # lexemes.txt pairs are (word, synset), the words carry the vectors
+        return self.folder + "/words.txt", self.folder + "/synsets.txt"
 
     def extractWordsAndSynsets(self, filenameWords, filenameSynsets,  filenameLexemes):
         #file
-        fWords = codecs.open(filenameWords, 'w', 'utf-8')
-        fSynsets = codecs.open(filenameSynsets, 'w',  'utf-8')
-        fLexemes = codecs.open(filenameLexemes, 'w',  'utf-8')
+        append = self.plan == 'append'
+        fWords = open_output(filenameWords, append)
+        fSynsets = open_output(filenameSynsets)
+        fLexemes = open_output(filenameLexemes, append)
+        progress = Progress('%s synsets' % self.lang, self.mode)
 
-        wordCounter = 0
+        wordCounter = len(self.WordIndex)
         wordCounterAll = 0
         synsetCounter = 0
         synsetCounterAll = 0
@@ -87,8 +118,11 @@ class ForwardWordNetExtractor:
             _synsetCounterAll[pos] = 0
             _lexemCounter[pos] = 0
             _lexemCounterAll[pos] = 0
-            ovv[pos] = []
-            for synset in wn.all_synsets(pos=pos):
+            ovv[pos] = set()
+            self.synsets[pos] = []
+            for synset in wordnet().all_synsets(pos=pos):
+                self.synsets[pos].append(synset)
+                progress.update(synset)
                 synsetCounterAll += 1
                 _synsetCounterAll[pos] += 1
                 synsetId = synset.name()
@@ -100,7 +134,7 @@ class ForwardWordNetExtractor:
                     _lexemCounterAll[pos] += 1
                     wordId = lemma.name()
 
-                    if wordId in self.model.keys():
+                    if wordId in self.model:
                         wordInSynset += 1
                         if wordId not in self.WordIndex:
                             fWords.write('%s %s\n' % (wordId, self.model[wordId]))
@@ -114,11 +148,11 @@ class ForwardWordNetExtractor:
                         count = lemma.count()
 
                         fSynsets.write('%s,' % lexemeId)
-                        fLexemes.write('%d %d %d\n' % (self.WordIndex[wordId], synsetCounterAll, count))
+                        if self.WordIndex[wordId] > self.appendFrom:
+                            fLexemes.write('%d %d %d\n' % (self.WordIndex[wordId], synsetCounterAll, count))
 
                     else:
-                        if wordId not in ovv[pos]:
-                            ovv[pos].append(wordId)
+                        ovv[pos].add(wordId)
 
                 fSynsets.write('\n')
                 if wordInSynset != 0:
@@ -134,51 +168,70 @@ class ForwardWordNetExtractor:
         fWords.close()
         fSynsets.close()
         fLexemes.close()
-
-    def extractWordRelations(self, filename, relation_symbol):
-        affectedPOS = {}
-        f = codecs.open(filename, 'w', 'utf-8')
-        for pos in self.pos_list:
-            for synset in wn.all_synsets(pos=pos):
+        progress.close()
+
+    def extractRelations(self, pos_list=None, suffix=''):
+        """
+        walk the synsets once and write all relation files at the same time
+        """
+        if pos_list is None:
+            pos_list = self.pos_list
+        relations = []
+        for filename, relation_symbol in self.relation_files():
+            # part files of a parallel run are appended when they are merged
+            append = self.plan == 'append' and not suffix
+            relations.append((open_output(filename + suffix, append), relation_symbol, {}))
+        progress = Progress('%s relations' % self.lang, self.mode)
+
+        for pos in pos_list:
+            for synset in self._synsets(pos):
+                progress.update(synset)
                 synsetId = synset.name()
-                # get related words
-                if relation_symbol == '!':
-                    targetSynsets = []
-                    for l in synset.lemmas():
-                        for a in l.antonyms():
-                            targetSynsets.append(a.synset())
-                else:
-                    targetSynsets = synset._related(relation_symbol)
-
-                for targetSynset in targetSynsets:
-                    pos = targetSynset.pos()
-                    targetSynsetId = targetSynset.name()
-
-                    if pos in affectedPOS:
-                        affectedPOS[pos] += 1
-                    else:
-                        affectedPOS[pos] = 1
-
-                    if synsetId in self.SynsetIndex and targetSynsetId in self.SynsetIndex:
-                        if self.SynsetIndex[synsetId] >= 0 and self.SynsetIndex[targetSynsetId] >= 0:
-                            f.write('%d %d\n' % (self.SynsetIndex[synsetId], self.SynsetIndex[targetSynsetId]))
+                for f, relation_symbol, affectedPOS in relations:
+                    # get related words
+                    if relation_symbol == '!':
+                        targetSynsets = []
+                        for l in synset.lemmas():
+                            for a in l.antonyms():
+                                targetSynsets.append(a.synset())
                     else:
-                        print(synsetId, targetSynsetId)
-        f.close()
-        print("Extracted %s: done!\n" % self.pointer_map[relation_symbol])
-
-        for k,v in affectedPOS.items():
-            print("  %s: %d\n" % (k, v))
+                        targetSynsets = synset._related(relation_symbol)
+
+                    for targetSynset in targetSynsets:
+                        targetPos = targetSynset.pos()
+                        targetSynsetId = targetSynset.name()
+
+                        if targetPos in affectedPOS:
+                            affectedPOS[targetPos] += 1
+                        else:
+                            affectedPOS[targetPos] = 1
+
+                        if synsetId in self.SynsetIndex and targetSynsetId in self.SynsetIndex:
+                            source, target = self.SynsetIndex[synsetId], self.SynsetIndex[targetSynsetId]
+                            # pairs between covered synsets were written by the previous run
+                            if source >= 0 and target >= 0 and not (source in self.covered and target in self.covered):
+                                f.write('%d %d\n' % (source, target))
+                        else:
+                            print(synsetId, targetSynsetId)
+
+        progress.close()
+        for f, relation_symbol, affectedPOS in relations:
+            f.close()
+            print("Extracted %s: done!\n" % self.pointer_map[relation_symbol])
+
+            for k,v in affectedPOS.items():
+                print("  %s: %d\n" % (k, v))
+
+    def _synsets(self, pos):
+        # synsets walked by extractWordsAndSynsets, or walk WordNet again
+        # when the relations are extracted in another process
+        if pos in self.synsets:
+            return self.synsets[pos]
+        return wordnet().all_synsets(pos=pos)
 
 if __name__ == '__main__':
-    # get root
-    root = sys.argv[1]
-    # get languages
-    langs = sys.argv[2:]
-
-    for lang in langs:
-        fwne = ForwardWordNetExtractor(root, lang)
-        fwne.main()
+    args = parse_args('extract words, synsets and relations for AutoExtend (forward, with lemma counts)')
+    run(ForwardWordNetExtractor, args.root, args.langs, jobs=args.jobs, mode=args.mode)
 
     #List of Languages
     #     ['als', 'arb', 'cat', 'cmn', 'dan', 'eng', 'eus', 'fas',
@@ -0,0 +1,310 @@
+# Sharing the data loaded by exWordNet between processes
+#
+# the compiled vector stores, frequency tables and normalized matrices loaded
+# by one process are copied once into a single block of shared memory
+# (multiprocessing.shared_memory) or a file, other processes attach to the
+# block and read the arrays in place, read-only and without copying
+# keys are kept as fixed width utf-8 bytes in row order with a sorted
+# permutation, so attached lookups are a np.searchsorted instead of a dict
+# built in every process
+#
+# layout: 8 byte little endian length of a json descriptor, the descriptor,
+# then every array aligned to 64 bytes
+import json
+import mmap
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+class SharedDataError(Exception):
+    """An exception class for shared data errors."""
+
+_HEADER = 8
+_ALIGN = 64
+
+def encode_keys(keys):
+    """
+    fixed width utf-8 byte array of the keys
+    """
+    return np.array([k.encode('utf-8') for k in keys], dtype=bytes)
+
+def _attach_shm(name):
+    """
+    attach an existing block without handing it to the resource tracker,
+    which would otherwise unlink it when this process exits
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+class SharedKeys(object):
+    """
+    read-only sequence of str keys over a byte key array
+    """
+    def __init__(self, keys):
+        self._keys = keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __getitem__(self, i):
+        return self._keys[i].decode('utf-8')
+
+    def __iter__(self):
+        for key in self._keys:
+            yield key.decode('utf-8')
+
+class SharedIndex(object):
+    """
+    key -> row lookup over keys in row order and the permutation sorting them
+    """
+    def __init__(self, keys, order):
+        self._keys = keys
+        self._order = order
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        return SharedKeys(self._keys)
+
+    def index(self, key):
+        """
+        row of the key, or -1 if the key is not in the index
+        """
+        if len(self._keys) == 0:
+            return -1
+        key = key.encode('utf-8')
+        i = np.searchsorted(self._keys, key, sorter=self._order)
+        if i < len(self._order) and self._keys[self._order[i]] == key:
+            return int(self._order[i])
+        return -1
+
+    def indices(self, keys):
+        """
+        rows of many keys as an array, -1 for keys not in the index
+        """
+        keys = encode_keys(keys)
+        if len(self._keys) == 0 or len(keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        i = np.searchsorted(self._keys, keys, sorter=self._order)
+        rows = self._order[np.minimum(i, len(self._order)-1)].astype(np.int64)
+        rows[self._keys[rows] != keys] = -1
+        return rows
+
+class SharedVectorStore(object):
+    """
+    attached version of vectorstore.VectorStore, with the same methods
+    """
+    def __init__(self, file_name, index, matrix):
+        self._file_name = file_name
+        self._index = index
+        self._matrix = matrix
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return self._index.index(key) >= 0
+
+    def keys(self):
+        return self._index.keys()
+
+    def dim(self):
+        return self._matrix.shape[1]
+
+    def matrix(self):
+        return self._matrix
+
+    def index(self, key):
+        return self._index.index(key)
+
+    def indices(self, keys):
+        return self._index.indices(keys)
+
+    def get(self, key, default=None):
+        i = self._index.index(key)
+        if i < 0:
+            return default
+        return self._matrix[i]
+
+    def close(self):
+        self._matrix = None
+
+    def __repr__(self):
+        return "%s('%s')" % (type(self).__name__, self._file_name)
+
+class SharedFreqTable(object):
+    """
+    attached version of the frequency table of exWordNet, with the same methods
+    """
+    def __init__(self, index, counts, total):
+        self._index = index
+        self._counts = counts
+        self._total = total
+
+    def __len__(self):
+        return len(self._index)
+
+    def total(self):
+        return self._total
+
+    def keys(self):
+        return self._index.keys()
+
+    def counts(self):
+        return self._counts
+
+    def count(self, key):
+        i = self._index.index(key)
+        if i < 0:
+            return 0
+        return int(self._counts[i])
+
+    def freq(self, key):
+        return self.count(key)/self._total
+
+    def freqs(self, keys):
+        rows = self._index.indices(keys)
+        found = rows >= 0
+        freqs = np.zeros(len(rows))
+        freqs[found] = self._counts[rows[found]]/self._total
+        return freqs
+
+class SharedData(object):
+    """
+    block of published arrays in shared memory or in a file
+    the process that created it owns it and calls unlink() when no process
+    needs it anymore, every process calls close() when it is done with it
+    """
+    def __init__(self, name, buf, descriptor, shm=None, mm=None, owner=False):
+        self.name = name
+        self._buf = buf
+        self._descriptor = descriptor
+        self._shm = shm
+        self._mm = mm
+        self._owner = owner
+
+    @classmethod
+    def create(cls, resources, name=None, path=None):
+        """
+        copy resources, a list of (kind, name, meta, {array name: array}),
+        into a new shared memory block, or into the file path if given
+        """
+        entries = []
+        offset = 0
+        for kind, key, meta, arrays in resources:
+            layout = {}
+            for array_name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                offset = -(-offset // _ALIGN) * _ALIGN
+                layout[array_name] = [offset, array.dtype.str, list(array.shape)]
+                offset += array.nbytes
+            entries.append(dict(kind=kind, name=key, meta=meta, arrays=layout))
+        descriptor = json.dumps(dict(resources=entries)).encode('utf-8')
+        start = -(-(_HEADER + len(descriptor)) // _ALIGN) * _ALIGN
+        size = max(start + offset, 1)
+
+        shm = mm = None
+        if path is None:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            buf = shm.buf
+            name = shm.name
+        else:
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            with open(path, 'r+b') as f:
+                mm = mmap.mmap(f.fileno(), size)
+            buf = memoryview(mm)
+            name = path
+
+        buf[:_HEADER] = len(descriptor).to_bytes(_HEADER, 'little')
+        buf[_HEADER:_HEADER+len(descriptor)] = descriptor
+        for (kind, key, meta, arrays), entry in zip(resources, entries):
+            for array_name, array in arrays.items():
+                offset, dtype, shape = entry['arrays'][array_name]
+                view = np.ndarray(shape, dtype=dtype, buffer=buf, offset=start + offset)
+                view[...] = array
+                del view
+        if mm is not None:
+            mm.flush()
+        return cls(name, buf, json.loads(descriptor.decode('utf-8')), shm=shm, mm=mm, owner=True)
+
+    @classmethod
+    def attach(cls, name=None, path=None):
+        """
+        attach to a block created by create(), read-only
+        """
+        shm = mm = None
+        if path is None:
+            if name is None:
+                raise SharedDataError('name or path of the shared data is needed')
+            shm = _attach_shm(name)
+            buf = shm.buf
+        else:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buf = memoryview(mm)
+            name = path
+        length = int.from_bytes(bytes(buf[:_HEADER]), 'little')
+        descriptor = json.loads(bytes(buf[_HEADER:_HEADER+length]).decode('utf-8'))
+        return cls(name, buf, descriptor, shm=shm, mm=mm)
+
+    def resources(self):
+        """
+        (kind, name, meta, {array name: read-only array}) of every resource
+        """
+        length = int.from_bytes(bytes(self._buf[:_HEADER]), 'little')
+        start = -(-(_HEADER + length) // _ALIGN) * _ALIGN
+        for entry in self._descriptor['resources']:
+            arrays = {}
+            for array_name, (offset, dtype, shape) in entry['arrays'].items():
+                count = int(np.prod(shape))
+                if count == 0:
+                    array = np.empty(shape, dtype=dtype)
+                else:
+                    # frombuffer keeps the mapping exported, so it cannot be
+                    # unmapped while the array is alive
+                    array = np.frombuffer(self._buf, dtype=dtype, count=count, offset=start + offset).reshape(shape)
+                array.flags.writeable = False
+                arrays[array_name] = array
+            yield entry['kind'], entry['name'], entry['meta'], arrays
+
+    def close(self):
+        """
+        release the mapping of this process
+        if arrays handed out are still referenced, the mapping stays until they are gone
+        """
+        self._buf = None
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                # not unmapped when the block object is collected either,
+                # the mapping goes away with the last array using it
+                self._shm._mmap = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+
+    def unlink(self):
+        """
+        remove the shared memory block or the file, by the owner only
+        """
+        if not self._owner:
+            raise SharedDataError('only the process which created %s can unlink it' % self.name)
+        if self._shm is not None:
+            self._shm.unlink()
+        elif os.path.exists(self.name):
+            os.remove(self.name)
+
+    def __repr__(self):
+        return "%s('%s')" % (type(self).__name__, self.name)
@@ -0,0 +1,256 @@
+# Compiled vector store for exWordNet data files
+#
+# a text vector file such as synsets.txt, <lang>/lemmas.txt or <lang>/words.txt
+# ("key v1 v2 ... vn" per line) is compiled once into two sibling files
+#   <name>.keys  one key per line, in the order of the text file
+#   <name>.npy   contiguous float32 matrix, row i belongs to key i
+# the matrix is opened with np.memmap so only the rows actually used are paged in
+import os
+import sys
+
+import numpy as np
+
+class VectorStoreError(Exception):
+    """An exception class for vector store errors."""
+
+def compiled_paths(file_name):
+    """
+    return the paths of the key index and the matrix
+    compiled from the text vector file
+    """
+    base = os.path.splitext(file_name)[0]
+    return '%s.keys' % base, '%s.npy' % base
+
+def is_compiled(file_name):
+    """
+    check whether an up-to-date compiled store exists for the text vector file
+    the text file itself does not have to exist
+    """
+    keys_file, matrix_file = compiled_paths(file_name)
+    if not (os.path.exists(keys_file) and os.path.exists(matrix_file)):
+        return False
+    if os.path.exists(file_name):
+        return os.path.getmtime(matrix_file) >= os.path.getmtime(file_name)
+    return True
+
+def _is_header(tokens):
+    # word2vec style header "<count> <dim>"
+    return len(tokens) == 2 and tokens[0].isdigit() and tokens[1].isdigit()
+
+def write_store(file_name, keys, matrix, dtype=np.float32):
+    """
+    write keys and matrix as the compiled store for file_name
+    files are replaced atomically, so stores already opened keep their old data
+    """
+    keys = list(keys)
+    if len(keys) != len(matrix):
+        raise VectorStoreError('%d keys for %d vectors' % (len(keys), len(matrix)))
+    keys_file, matrix_file = compiled_paths(file_name)
+    with open(matrix_file + '.tmp', 'wb') as f:
+        np.save(f, np.asarray(matrix, dtype=dtype))
+    _write_keys(keys_file, keys)
+    os.replace(matrix_file + '.tmp', matrix_file)
+
+def add_to_store(file_name, key, vector, dtype=np.float32):
+    """
+    add the vector for key to the compiled store, replacing the old one if any
+    the store is created if it does not exist yet
+    """
+    vector = np.asarray(vector, dtype=dtype)
+    keys = []
+    matrix = np.zeros((0, len(vector)), dtype=dtype)
+    keys_file, matrix_file = compiled_paths(file_name)
+    if os.path.exists(keys_file) and os.path.exists(matrix_file):
+        store = VectorStore(file_name)
+        keys = list(store.keys())
+        matrix = np.array(store.matrix())
+        store.close()
+        if matrix.shape[1] != len(vector):
+            raise VectorStoreError('dimension of %s is %d, not %d' % (file_name, matrix.shape[1], len(vector)))
+
+    if key in keys:
+        matrix[keys.index(key)] = vector
+    else:
+        keys.append(key)
+        matrix = np.vstack([matrix, vector])
+    write_store(file_name, keys, matrix, dtype=dtype)
+
+def add_to_vector_file(file_name, key, vector):
+    """
+    add the line for key to the text vector file, replacing the old one if any
+    lines are kept sorted by key so that the file can still be binary searched,
+    the file is created if it does not exist yet
+    """
+    vector = np.asarray(vector, dtype=np.float64)
+    lines = {}
+    if os.path.exists(file_name):
+        with open(file_name, 'r', encoding='utf-8') as f:
+            for line in f:
+                tokens = line.split()
+                if len(tokens) == 0 or _is_header(tokens):
+                    continue
+                if len(tokens) - 1 != len(vector):
+                    raise VectorStoreError('dimension of %s is %d, not %d' % (file_name, len(tokens) - 1, len(vector)))
+                lines[tokens[0]] = line.rstrip('\n') + '\n'
+    lines[key] = '%s %s\n' % (key, ' '.join(repr(float(v)) for v in vector))
+    with open(file_name + '.tmp', 'w', encoding='utf-8') as f:
+        for k in sorted(lines):
+            f.write(lines[k])
+    os.replace(file_name + '.tmp', file_name)
+
+def _write_keys(keys_file, keys):
+    with open(keys_file + '.tmp', 'w', encoding='utf-8') as f:
+        for key in keys:
+            f.write('%s\n' % key)
+    os.replace(keys_file + '.tmp', keys_file)
+
+def create_store(file_name, keys, dim, dtype=np.float32):
+    """
+    create a new compiled store for file_name with zero vectors
+    returns the writable memmapped matrix, rows follow the order of keys
+    the store is written to temporary files and only replaces the old one
+    when finish_store is called, so a build that fails halfway leaves nothing
+    """
+    keys = list(keys)
+    keys_file, matrix_file = compiled_paths(file_name)
+    with open(keys_file + '.tmp', 'w', encoding='utf-8') as f:
+        for key in keys:
+            f.write('%s\n' % key)
+    return np.lib.format.open_memmap(matrix_file + '.tmp', mode='w+', dtype=dtype, shape=(len(keys), dim))
+
+def finish_store(file_name, matrix):
+    """
+    flush the matrix from create_store and move the new store into place
+    """
+    keys_file, matrix_file = compiled_paths(file_name)
+    matrix.flush()
+    os.replace(keys_file + '.tmp', keys_file)
+    os.replace(matrix_file + '.tmp', matrix_file)
+
+def discard_store(file_name):
+    """
+    remove the temporary files of a store from create_store which is not finished
+    """
+    for path in compiled_paths(file_name):
+        if os.path.exists(path + '.tmp'):
+            os.remove(path + '.tmp')
+
+def compile_vector_file(file_name, dtype=np.float32):
+    """
+    compile the text vector file into a key index and a float32 matrix
+    the file is read twice so that the whole text never has to be kept in memory
+    """
+    count = 0
+    dim = None
+    with open(file_name, 'r', encoding='utf-8') as f:
+        for line in f:
+            tokens = line.split()
+            if len(tokens) == 0 or _is_header(tokens):
+                continue
+            if dim is None:
+                dim = len(tokens) - 1
+            elif len(tokens) - 1 != dim:
+                raise VectorStoreError('inconsistent dimension for %s in %s' % (tokens[0], file_name))
+            count += 1
+
+    if dim is None:
+        raise VectorStoreError('no vector found in %s' % file_name)
+
+    # written to new files and renamed at the end like write_store, so that
+    # stores already opened by other processes keep their old data
+    keys_file, matrix_file = compiled_paths(file_name)
+    matrix = np.lib.format.open_memmap(matrix_file + '.tmp', mode='w+', dtype=dtype, shape=(count, dim))
+    with open(file_name, 'r', encoding='utf-8') as f, open(keys_file + '.tmp', 'w', encoding='utf-8') as fk:
+        i = 0
+        for line in f:
+            tokens = line.split()
+            if len(tokens) == 0 or _is_header(tokens):
+                continue
+            fk.write('%s\n' % tokens[0])
+            matrix[i] = np.array(tokens[1:], dtype=dtype)
+            i += 1
+    matrix.flush()
+    del matrix
+    os.replace(keys_file + '.tmp', keys_file)
+    os.replace(matrix_file + '.tmp', matrix_file)
+    return count, dim
+
+def compile_root(root, langs=()):
+    """
+    compile every vector file under root
+    synsets.txt and topics.txt, and lemmas.txt, words.txt for each language
+    """
+    file_names = ['%s/synsets.txt' % root, '%s/topics.txt' % root]
+    for lang in langs:
+        file_names.append('%s/%s/lemmas.txt' % (root, lang))
+        file_names.append('%s/%s/words.txt' % (root, lang))
+
+    for file_name in file_names:
+        if not os.path.exists(file_name):
+            print('Skipped %s: not found' % file_name)
+            continue
+        count, dim = compile_vector_file(file_name)
+        print('Compiled %s: %d x %d' % (file_name, count, dim))
+
+class VectorStore(object):
+    """
+    read-only view over a compiled vector file
+    lookups are a dict access and return a zero-copy row of the memmapped matrix
+    """
+    def __init__(self, file_name):
+        keys_file, matrix_file = compiled_paths(file_name)
+        self._file_name = file_name
+        with open(keys_file, 'r', encoding='utf-8') as f:
+            self._keys = f.read().splitlines()
+        self._index = dict(zip(self._keys, range(len(self._keys))))
+        self._matrix = np.load(matrix_file, mmap_mode='r')
+        if len(self._keys) != self._matrix.shape[0]:
+            raise VectorStoreError('key index and matrix of %s do not match' % file_name)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return self._keys
+
+    def dim(self):
+        return self._matrix.shape[1]
+
+    def matrix(self):
+        return self._matrix
+
+    def index(self, key):
+        """
+        row number of the key, or -1 if the key is not in the store
+        """
+        return self._index.get(key, -1)
+
+    def indices(self, keys):
+        """
+        row numbers of many keys as an array, -1 for keys not in the store
+        """
+        return np.fromiter((self._index.get(k, -1) for k in keys), dtype=np.int64)
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        if i is None:
+            return default
+        return self._matrix[i]
+
+    def close(self):
+        # the mapping is released once rows handed out to callers are gone
+        self._matrix = None
+
+    def __repr__(self):
+        return "%s('%s')" % (type(self).__name__, self._file_name)
+
+if __name__ == '__main__':
+    # get root
+    root = sys.argv[1]
+    # get languages
+    langs = sys.argv[2:]
+
+    compile_root(root, langs)